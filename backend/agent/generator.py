@@ -1,11 +1,13 @@
 ﻿from __future__ import annotations
 
+import asyncio
 import json
+from collections.abc import AsyncIterator
 from typing import Any
 
 from ..core.config import SETTINGS
 from ..core.logger import get_logger
-from ..core.utils import normalize_text, parse_json_loose, short_hash
+from ..core.utils import JSONObjectStream, normalize_text, parse_json_loose, short_hash
 from ..models.tweet import GenerateTweetsRequest, TweetCandidate
 from ..models.trend import Trend
 from ..providers import router
@@ -33,9 +35,21 @@ class TweetGenerator:
 
     ALLOWED_ANGLES = {"insight", "contradiction", "question", "punchline", "data", "ironie", "urgence", "surprise"}
 
+    CONSTRAINTS = (
+        "Contraintes strictes:\n"
+        "- 280 caracteres maximum\n"
+        "- 1 idee forte par tweet\n"
+        "- pas de markdown\n"
+        "- pas de guillemets autour des phrases\n"
+        "- concret, specifique, avec un twist\n"
+        "- 0 a 2 hashtags MAX et seulement si pertinents\n"
+        "- ne PAS ajouter #IA si le sujet n'est pas l'IA\n"
+        "- angle OBLIGATOIRE dans cette liste: insight, contradiction, question, punchline, data, ironie, urgence, surprise\n"
+    )
+
     async def generate_candidates(self, request: GenerateTweetsRequest, trend: Trend) -> list[TweetCandidate]:
         prompt = self._build_prompt(request=request, trend=trend, n=request.count)
-        result = await router.generate(prompt)
+        result = await router.generate(prompt, use_cache=not request.bypass_cache)
 
         candidates = self._to_candidates(raw=result.text, provider=result.provider, request=request, trend=trend)
         if not candidates:
@@ -47,6 +61,135 @@ class TweetGenerator:
 
         return deduped[: request.count]
 
+    async def generate_batch(
+        self,
+        items: list[tuple[GenerateTweetsRequest, Trend]],
+    ) -> list[list[TweetCandidate]]:
+        """Generate candidates for several trends with as few LLM calls as the token budget allows.
+
+        Results are aligned with `items`. A trend whose key is missing or unusable in the
+        batched answer is regenerated on its own with `generate_candidates`; a failed
+        LLM call raises, as it does for a single trend.
+        """
+        batches = self._pack_batches(items)
+        results = await asyncio.gather(*(self._run_batch(batch) for batch in batches))
+
+        merged: dict[int, list[TweetCandidate]] = {}
+        for batch_result in results:
+            merged.update(batch_result)
+        return [merged[index] for index in range(len(items))]
+
+    def _pack_batches(
+        self,
+        items: list[tuple[GenerateTweetsRequest, Trend]],
+    ) -> list[list[tuple[int, GenerateTweetsRequest, Trend, str]]]:
+        cfg = SETTINGS.generation
+        budget = cfg.batch_token_budget - self._estimate_tokens(self._batch_preamble())
+        batches: list[list[tuple[int, GenerateTweetsRequest, Trend, str]]] = []
+        current: list[tuple[int, GenerateTweetsRequest, Trend, str]] = []
+        used = 0
+
+        for index, (request, trend) in enumerate(items):
+            block = self._batch_block(f"T{index + 1}", request, trend)
+            cost = self._estimate_tokens(block) + request.count * cfg.batch_tokens_per_tweet
+            if current and (used + cost > budget or len(current) >= max(1, cfg.batch_max_trends)):
+                batches.append(current)
+                current, used = [], 0
+            current.append((index, request, trend, block))
+            used += cost
+
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _run_batch(
+        self,
+        batch: list[tuple[int, GenerateTweetsRequest, Trend, str]],
+    ) -> dict[int, list[TweetCandidate]]:
+        if len(batch) == 1:
+            index, request, trend, _ = batch[0]
+            return {index: await self.generate_candidates(request=request, trend=trend)}
+
+        prompt = self._batch_preamble() + "\n".join(block for _, _, _, block in batch)
+        max_tokens = sum(request.count for _, request, _, _ in batch) * SETTINGS.generation.batch_tokens_per_tweet
+        use_cache = not any(request.bypass_cache for _, request, _, _ in batch)
+
+        # A failed call propagates like it does in `generate_candidates`: retrying it per
+        # trend would turn one dead provider into len(batch) more failed calls.
+        result = await router.generate(
+            prompt,
+            use_cache=use_cache,
+            max_tokens=max(SETTINGS.llm.max_output_tokens, max_tokens),
+        )
+        payload: Any = parse_json_loose(result.text)
+        provider = result.provider
+
+        resolved: dict[int, list[TweetCandidate]] = {}
+        retry: list[tuple[int, GenerateTweetsRequest, Trend]] = []
+        for index, request, trend, _ in batch:
+            rows = payload.get(f"T{index + 1}") if isinstance(payload, dict) else None
+            candidates = []
+            if isinstance(rows, list):
+                for row in rows:
+                    if isinstance(row, dict):
+                        candidate = self._row_to_candidate(row=row, provider=provider, request=request, trend=trend)
+                        if candidate is not None:
+                            candidates.append(candidate)
+            if not candidates:
+                retry.append((index, request, trend))
+                continue
+            deduped = self._dedupe(candidates)
+            if len(deduped) < request.count:
+                deduped.extend(
+                    self._fallback_candidates(trend=trend, request=request, missing=request.count - len(deduped))
+                )
+            resolved[index] = deduped[: request.count]
+
+        if retry:
+            logger.info("Batched generation: %s/%s trends regenerated individually", len(retry), len(batch))
+            singles = await asyncio.gather(
+                *(self.generate_candidates(request=request, trend=trend) for _, request, trend in retry)
+            )
+            for (index, _, _), candidates in zip(retry, singles):
+                resolved[index] = candidates
+        return resolved
+
+    async def stream_candidates(self, request: GenerateTweetsRequest, trend: Trend) -> AsyncIterator[TweetCandidate]:
+        """Yield validated candidates as soon as each JSON object is closed by the model."""
+        prompt = self._build_prompt(request=request, trend=trend, n=request.count)
+        parser = JSONObjectStream()
+        seen: set[str] = set()
+        emitted = 0
+        provider = "fallback"
+
+        async for chunk in router.stream(prompt, use_cache=not request.bypass_cache):
+            provider = chunk.provider
+            for row in parser.feed(chunk.text):
+                candidate = self._row_to_candidate(row=row, provider=provider, request=request, trend=trend)
+                if candidate is None or emitted >= request.count:
+                    continue
+                key = short_hash(candidate.text)
+                if key in seen:
+                    continue
+                seen.add(key)
+                emitted += 1
+                yield candidate
+
+        if emitted == 0:
+            # Model ignored the JSON format: fall back to the line-based parser on the full text.
+            candidates = self._to_candidates(raw=parser.text, provider=provider, request=request, trend=trend)
+            if not candidates:
+                raise RuntimeError("LLM returned no usable tweets")
+            for candidate in self._dedupe(candidates)[: request.count]:
+                seen.add(short_hash(candidate.text))
+                emitted += 1
+                yield candidate
+
+        if emitted < request.count:
+            for candidate in self._fallback_candidates(trend=trend, request=request, missing=request.count - emitted):
+                if short_hash(candidate.text) not in seen:
+                    yield candidate
+
     def _build_prompt(self, request: GenerateTweetsRequest, trend: Trend, n: int) -> str:
         tone = self.THEME_TONE.get(request.theme, "direct")
         avoid = memory_engine.get_similar_texts(trend.title, threshold=0.7)[:4]
@@ -62,21 +205,45 @@ class TweetGenerator:
             f"Sujet: {trend.title}\n"
             f"Contexte: {trend.summary}\n"
             f"Nombre de tweets: {n}\n\n"
-            "Contraintes strictes:\n"
-            "- 280 caracteres maximum\n"
-            "- 1 idee forte par tweet\n"
-            "- pas de markdown\n"
-            "- pas de guillemets autour des phrases\n"
-            "- concret, specifique, avec un twist\n"
-            "- 0 a 2 hashtags MAX et seulement si pertinents\n"
-            "- ne PAS ajouter #IA si le sujet n'est pas l'IA\n"
-            "- angle OBLIGATOIRE dans cette liste: insight, contradiction, question, punchline, data, ironie, urgence, surprise\n"
+            f"{self.CONSTRAINTS}"
             "- eviter les repetitions avec ces exemples historiques:\n"
             f"{avoid_block}\n\n"
             "Reponds UNIQUEMENT en JSON strict (tableau) :"
             " [{\"text\":\"...\",\"angle\":\"insight|contradiction|question|punchline|data|ironie|urgence|surprise\"}]"
         )
 
+    def _batch_preamble(self) -> str:
+        return (
+            "Tu es un ghostwriter FR expert en tweets viraux.\n"
+            "Tu ecris UNIQUEMENT en francais naturel (pas une traduction).\n"
+            "Tu traites plusieurs sujets independants, chacun identifie par une cle (T1, T2, ...).\n\n"
+            f"{self.CONSTRAINTS}"
+            "- eviter les repetitions avec les exemples historiques donnes pour chaque sujet\n\n"
+            "Reponds UNIQUEMENT en JSON strict (objet, une cle par sujet) :"
+            " {\"T1\":[{\"text\":\"...\",\"angle\":\"insight|contradiction|question|punchline|data|ironie|urgence|surprise\"}],\"T2\":[...]}\n\n"
+        )
+
+    def _batch_block(self, key: str, request: GenerateTweetsRequest, trend: Trend) -> str:
+        tone = self.THEME_TONE.get(request.theme, "direct")
+        avoid = memory_engine.get_similar_texts(trend.title, threshold=0.7)[:4]
+        avoid_block = "\n".join(f"  - {line}" for line in avoid) if avoid else "  - Aucun"
+        return (
+            f"[{key}]\n"
+            f"Theme: {request.theme}\n"
+            f"Style: {request.style}\n"
+            f"Angle viral principal: {trend.viral_angle}\n"
+            f"Ton editorial: {tone}\n"
+            f"Sujet: {trend.title}\n"
+            f"Contexte: {trend.summary}\n"
+            f"Nombre de tweets: {request.count}\n"
+            "A eviter:\n"
+            f"{avoid_block}\n"
+        )
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        return len(text) // 4 + 1
+
     def _to_candidates(
         self,
         raw: str,
@@ -97,31 +264,43 @@ class TweetGenerator:
 
         candidates: list[TweetCandidate] = []
         for row in rows:
-            text = normalize_text(str(row.get("text", "")))
-            if not text:
-                continue
-            if len(text) > 280:
-                text = text[:277] + "..."
-
-            angle = str(row.get("angle", trend.viral_angle)).strip().lower()
-            if angle not in self.ALLOWED_ANGLES:
-                angle = trend.viral_angle
-
-            candidates.append(
-                TweetCandidate(
-                    id=f"tw-{short_hash(text + trend.id)}",
-                    text=text,
-                    theme=request.theme,
-                    style=request.style,
-                    language="fr",
-                    angle=angle[:40],
-                    source_trend_id=trend.id,
-                    provider_used=provider,
-                )
-            )
+            candidate = self._row_to_candidate(row=row, provider=provider, request=request, trend=trend)
+            if candidate is not None:
+                candidates.append(candidate)
 
         return candidates
 
+    def _row_to_candidate(
+        self,
+        row: dict[str, Any],
+        provider: str,
+        request: GenerateTweetsRequest,
+        trend: Trend,
+    ) -> TweetCandidate | None:
+        text = normalize_text(str(row.get("text", "")))
+        if not text:
+            return None
+        if len(text) > 280:
+            text = text[:277] + "..."
+
+        angle = str(row.get("angle", trend.viral_angle)).strip().lower()
+        if angle not in self.ALLOWED_ANGLES:
+            angle = trend.viral_angle
+
+        try:
+            return TweetCandidate(
+                id=f"tw-{short_hash(text + trend.id)}",
+                text=text,
+                theme=request.theme,
+                style=request.style,
+                language="fr",
+                angle=angle[:40],
+                source_trend_id=trend.id,
+                provider_used=provider,
+            )
+        except Exception:  # noqa: BLE001
+            return None
+
     def _dedupe(self, tweets: list[TweetCandidate]) -> list[TweetCandidate]:
         seen: set[str] = set()
         deduped: list[TweetCandidate] = []
@@ -0,0 +1,33 @@
+﻿from __future__ import annotations
+
+from typing import Any
+
+from ..core.config import SETTINGS
+from ..core.job_queue import JobHandler, JobQueue, JobWorkers
+from ..models.tweet import ABTestRequest, GenerateTweetsRequest
+from .orchestrator import orchestrator
+from .pipeline import pipeline_runner
+
+
+async def _generate(payload: dict[str, Any]) -> dict[str, Any]:
+    request = GenerateTweetsRequest.model_validate(payload)
+    return (await orchestrator.generate(request)).model_dump()
+
+
+async def _ab_test(payload: dict[str, Any]) -> dict[str, Any]:
+    request = ABTestRequest.model_validate(payload)
+    return (await orchestrator.run_ab_test(request)).model_dump()
+
+
+async def _pipeline(payload: dict[str, Any]) -> dict[str, Any]:
+    return await pipeline_runner.run(**payload)
+
+
+JOB_HANDLERS: dict[str, JobHandler] = {
+    "generate": _generate,
+    "ab_test": _ab_test,
+    "pipeline": _pipeline,
+}
+
+job_queue = JobQueue()
+job_workers = JobWorkers(job_queue, JOB_HANDLERS, poll_interval_sec=SETTINGS.jobs.poll_interval_sec)
@@ -0,0 +1,78 @@
+﻿from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+
+
+@dataclass
+class TextFeatures:
+    theme_hits: dict[str, int] = field(default_factory=dict)
+    angles: list[str] = field(default_factory=list)
+    has_digit: bool = False
+
+
+class KeywordMatcher:
+    """Theme and angle detection in a single regex pass over lowercased text.
+
+    All keywords are compiled into one alternation with word boundaries (so "ai"
+    no longer matches inside "said"); the matched keyword is mapped back to its
+    themes/angles with a dict lookup. Standalone numbers report the `number_angle`,
+    a "?" the `question_angle`, and any digit sets `has_digit`.
+    """
+
+    def __init__(
+        self,
+        themes: dict[str, list[str]],
+        angles: dict[str, list[str]],
+        number_angle: str = "chiffres",
+        question_angle: str = "question",
+    ) -> None:
+        self.angle_order = list(angles)
+        self.number_angle = number_angle
+        self.question_angle = question_angle
+        self._themes: dict[str, list[str]] = {}
+        self._angles: dict[str, list[str]] = {}
+        for theme, keywords in themes.items():
+            for keyword in keywords:
+                self._themes.setdefault(keyword.lower(), []).append(theme)
+        for angle, keywords in angles.items():
+            for keyword in keywords:
+                self._angles.setdefault(keyword.lower(), []).append(angle)
+
+        vocabulary = sorted(set(self._themes) | set(self._angles), key=lambda kw: (-len(kw), kw))
+        alternation = "|".join(re.escape(keyword) for keyword in vocabulary) or r"(?!x)x"
+        self._pattern = re.compile(
+            rf"(?P<kw>\b(?:{alternation})\b)|(?P<num>\b\d+\b)|(?P<digit>\d)|(?P<q>\?)"
+        )
+
+    def scan(self, text: str) -> TextFeatures:
+        keywords: set[str] = set()
+        angles: set[str] = set()
+        has_digit = False
+        for match in self._pattern.finditer(text):
+            group = match.lastgroup
+            if group == "kw":
+                keyword = match.group()
+                keywords.add(keyword)
+                angles.update(self._angles.get(keyword, ()))
+                if keyword.isdigit():
+                    angles.add(self.number_angle)
+                    has_digit = True
+            elif group == "num":
+                angles.add(self.number_angle)
+                has_digit = True
+            elif group == "digit":
+                has_digit = True
+            elif group == "q":
+                angles.add(self.question_angle)
+
+        theme_hits: dict[str, int] = {}
+        # Each distinct keyword counts once, as the substring version did.
+        for keyword in keywords:
+            for theme in self._themes.get(keyword, ()):
+                theme_hits[theme] = theme_hits.get(theme, 0) + 1
+        return TextFeatures(
+            theme_hits=theme_hits,
+            angles=[angle for angle in self.angle_order if angle in angles],
+            has_digit=has_digit,
+        )
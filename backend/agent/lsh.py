@@ -0,0 +1,91 @@
+﻿from __future__ import annotations
+
+import hashlib
+import random
+from collections.abc import Sequence
+
+from ..core.utils import jaccard_tokens
+
+
+def shingles(tokens: Sequence[str], size: int = 1) -> frozenset[str]:
+    """Word n-grams of `size`; a text shorter than `size` becomes a single shingle."""
+    if size <= 1:
+        return frozenset(tokens)
+    if len(tokens) <= size:
+        return frozenset([" ".join(tokens)]) if tokens else frozenset()
+    return frozenset(" ".join(tokens[i : i + size]) for i in range(len(tokens) - size + 1))
+
+
+class MinHasher:
+    """MinHash signatures: one 64-bit hash per shingle, permuted with XOR masks."""
+
+    def __init__(self, num_perm: int, seed: int = 1) -> None:
+        rng = random.Random(seed)
+        self.masks = [rng.getrandbits(64) for _ in range(num_perm)]
+
+    def signature(self, items: frozenset[str]) -> tuple[int, ...]:
+        if not items:
+            return ()
+        hashes = [
+            int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest(), "little") for item in items
+        ]
+        return tuple(min(value ^ mask for value in hashes) for mask in self.masks)
+
+
+class LSHClusterer:
+    """Groups near-duplicate documents with MinHash LSH, then verifies pairs exactly.
+
+    Each document may have several fields (title, summary); a field only collides with
+    the same field of other documents. Candidate pairs from any band are confirmed with
+    the exact Jaccard score against that field's threshold, and confirmed pairs are
+    merged with union-find, so LSH only costs recall, never precision.
+    """
+
+    def __init__(self, bands: int = 16, rows: int = 4, seed: int = 1) -> None:
+        self.bands = max(1, bands)
+        self.rows = max(1, rows)
+        self.hasher = MinHasher(self.bands * self.rows, seed=seed)
+        self.candidate_pairs = 0
+        self.verified_pairs = 0
+
+    def cluster(self, fields: list[list[frozenset[str]]], thresholds: list[float]) -> list[list[int]]:
+        """`fields[i][f]` is the shingle set of field f for document i; returns index clusters."""
+        count = len(fields)
+        parent = list(range(count))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        self.candidate_pairs = 0
+        self.verified_pairs = 0
+        for field_index, threshold in enumerate(thresholds):
+            buckets: dict[tuple[int, tuple[int, ...]], list[int]] = {}
+            for doc_index, doc in enumerate(fields):
+                signature = self.hasher.signature(doc[field_index])
+                if not signature:
+                    continue
+                for band in range(self.bands):
+                    key = (band, signature[band * self.rows : (band + 1) * self.rows])
+                    buckets.setdefault(key, []).append(doc_index)
+
+            checked: set[tuple[int, int]] = set()
+            for members in buckets.values():
+                if len(members) < 2:
+                    continue
+                for pos, a in enumerate(members):
+                    for b in members[pos + 1 :]:
+                        if (a, b) in checked or find(a) == find(b):
+                            continue
+                        checked.add((a, b))
+                        self.candidate_pairs += 1
+                        if jaccard_tokens(fields[a][field_index], fields[b][field_index]) >= threshold:
+                            self.verified_pairs += 1
+                            parent[max(find(a), find(b))] = min(find(a), find(b))
+
+        clusters: dict[int, list[int]] = {}
+        for index in range(count):
+            clusters.setdefault(find(index), []).append(index)
+        return sorted(clusters.values(), key=lambda members: members[0])
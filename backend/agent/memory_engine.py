@@ -1,5 +1,6 @@
 ﻿from __future__ import annotations
 
+import asyncio
 import csv
 import json
 import threading
@@ -8,19 +9,38 @@ from typing import Any
 
 from ..core.config import SETTINGS
 from ..core.logger import get_logger
-from ..core.utils import jaccard_similarity, now_ts
+from ..core.utils import now_ts, tokenize
 from ..models.tweet import TweetCandidate
+from .memory_store import MAX_AB_TESTS, MemoryOp, MemoryStore, build_memory_store
+from .token_index import TokenIndex
 
 logger = get_logger(__name__)
 
 
 class MemoryEngine:
-    def __init__(self, storage_path: str | None = None) -> None:
-        self.path = Path(storage_path or SETTINGS.memory.path)
-        self.path.parent.mkdir(parents=True, exist_ok=True)
+    def __init__(
+        self,
+        storage_path: str | None = None,
+        store: MemoryStore | None = None,
+        durability: str = SETTINGS.memory.durability,
+    ) -> None:
+        self.store = store or build_memory_store(path=storage_path)
+        self.durability = durability
         self._lock = threading.Lock()
+        # Serializes store writes from the flusher thread; taken before `_lock`, never inside it.
+        self._persist_lock = threading.Lock()
         self._db: dict[str, Any] = self._default_db()
+        self._pending: list[MemoryOp] = []
+        self._flush_task: asyncio.Task | None = None
+        self._flush_event: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.flushes = 0
+        self.last_flush_at = 0.0
+        # Similarity index over all stored tweets; doc id = _index_base + position in _db["tweets"].
+        self._index = TokenIndex()
+        self._index_base = 0
         self._load_safe()
+        self._rebuild_index()
 
     def _default_db(self) -> dict[str, Any]:
         return {
@@ -42,26 +62,107 @@ class MemoryEngine:
         return safe
 
     def _load_safe(self) -> None:
-        if not self.path.exists():
-            self._save_safe()
+        payload = self.store.load()
+        if payload is None:
+            self._db = self._default_db()
+            self.store.replace(self._db)
+            return
+        self._db = self._sanitize_db(payload)
+
+    def _rebuild_index(self) -> None:
+        self._index.clear()
+        self._index_base = 0
+        for position, row in enumerate(self._db["tweets"]):
+            self._index.add(position, tokenize(row.get("text", "")))
+
+    def _save_safe(self, ops: list[MemoryOp]) -> None:
+        self._db["updated_at"] = now_ts()
+        if self._flush_task is None:
+            # Sync durability, or write-behind without a running flusher (CLI).
+            self._persist(ops)
             return
+        self._pending.extend(ops)
+        if len(self._pending) >= SETTINGS.memory.flush_dirty_threshold and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._flush_event.set)
+
+    def _persist(self, ops: list[MemoryOp], db: dict[str, Any] | None = None) -> bool:
         try:
-            payload = json.loads(self.path.read_text(encoding="utf-8"))
-            if not isinstance(payload, dict):
-                raise ValueError("invalid memory format")
-            self._db = self._sanitize_db(payload)
+            self.store.apply(ops, self._db if db is None else db)
+            return True
         except Exception as exc:  # noqa: BLE001
-            backup = self.path.with_suffix(".corrupted.json")
-            self.path.replace(backup)
-            logger.error("Memory corrupted. Backup saved to %s (%s)", backup, exc)
-            self._db = self._default_db()
-            self._save_safe()
+            logger.error("Memory persist failed (%s backend): %s", self.store.name, exc)
+            return False
 
-    def _save_safe(self) -> None:
-        self._db["updated_at"] = now_ts()
-        tmp = self.path.with_suffix(".tmp")
-        tmp.write_text(json.dumps(self._db, ensure_ascii=False, indent=2), encoding="utf-8")
-        tmp.replace(self.path)
+    def flush(self) -> int:
+        """Persist queued write-behind ops; returns how many were written."""
+        with self._persist_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                ops, self._pending = self._pending, []
+                db = self._snapshot_db()
+            # The disk write runs without `_lock`, so request handlers never wait on it.
+            ok = self._persist(ops, db)
+            with self._lock:
+                if not ok:
+                    # Keep them for the next attempt, ahead of anything queued since.
+                    self._pending = ops + self._pending
+                    return 0
+                self.flushes += 1
+                self.last_flush_at = now_ts()
+            return len(ops)
+
+    def _snapshot_db(self) -> dict[str, Any]:
+        """Copy of the state safe to serialize while the engine keeps mutating `_db`."""
+        db: dict[str, Any] = {}
+        for key, value in self._db.items():
+            if isinstance(value, list):
+                db[key] = list(value)
+            elif isinstance(value, dict):
+                # Stats buckets are updated in place.
+                db[key] = {name: dict(meta) if isinstance(meta, dict) else meta for name, meta in value.items()}
+            else:
+                db[key] = value
+        return db
+
+    def start(self) -> None:
+        """Start the write-behind flusher (no-op with sync durability)."""
+        if self.durability != "write_behind" or self._flush_task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._flush_event = asyncio.Event()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        task = self._flush_task
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        # Also waits (on `_persist_lock`) for a flush thread the cancelled loop left running.
+        await asyncio.to_thread(self.flush)
+        self._flush_task = None
+        self.flush()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=SETTINGS.memory.flush_interval_sec)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            await asyncio.to_thread(self.flush)
+
+    def persistence_stats(self) -> dict[str, Any]:
+        return {
+            "backend": self.store.name,
+            "durability": "write_behind" if self._flush_task is not None else "sync",
+            "pending_ops": len(self._pending),
+            "flushes": self.flushes,
+            "last_flush_at": self.last_flush_at or None,
+        }
 
     def register_generation(
         self,
@@ -83,20 +184,28 @@ class MemoryEngine:
             self._db["history"].append(snapshot)
             self._db["history"] = self._db["history"][-SETTINGS.memory.max_history :]
 
+            ops: list[MemoryOp] = [("history", snapshot)]
             for tweet in tweets:
-                self._register_tweet(tweet)
+                ops.extend(self._register_tweet(tweet))
 
-            self._save_safe()
+            self._save_safe(ops)
 
-    def _register_tweet(self, tweet: TweetCandidate) -> None:
-        exists = any(jaccard_similarity(tweet.text, row["text"]) >= 0.9 for row in self._db["tweets"][-200:])
-        if exists:
-            return
+    def _register_tweet(self, tweet: TweetCandidate) -> list[MemoryOp]:
+        tokens = tokenize(tweet.text)
+        if self._index.query(tokens, 0.9):
+            return []
 
         row = tweet.model_dump()
         row["created_at"] = now_ts()
-        self._db["tweets"].append(row)
-        self._db["tweets"] = self._db["tweets"][-SETTINGS.memory.max_tweets :]
+        tweets = self._db["tweets"]
+        tweets.append(row)
+        self._index.add(self._index_base + len(tweets) - 1, tokens)
+        overflow = len(tweets) - SETTINGS.memory.max_tweets
+        if overflow > 0:
+            for doc_id in range(self._index_base, self._index_base + overflow):
+                self._index.remove(doc_id)
+            self._index_base += overflow
+            del tweets[:overflow]
 
         style = row["style"]
         theme = row["theme"]
@@ -108,20 +217,27 @@ class MemoryEngine:
         heatmap["count"] += 1
         heatmap["score_sum"] += row["score"]
 
+        return [
+            ("tweet", row),
+            ("stat", {"kind": "style", "key": style, "count": 1, "score_sum": row["score"]}),
+            ("stat", {"kind": "theme", "key": theme, "count": 1, "score_sum": row["score"]}),
+        ]
+
     def add_favorite(self, tweet_id: str) -> bool:
         with self._lock:
             if tweet_id in self._db["favorites"]:
                 return False
             self._db["favorites"].append(tweet_id)
-            self._save_safe()
+            self._save_safe([("favorite", {"tweet_id": tweet_id})])
             return True
 
     def get_similar_texts(self, text: str, threshold: float = 0.82) -> list[str]:
+        """Stored tweets with Jaccard >= threshold, most similar (then newest) first."""
         with self._lock:
+            tweets = self._db["tweets"]
             return [
-                row["text"]
-                for row in self._db["tweets"][-500:]
-                if jaccard_similarity(text, row["text"]) >= threshold
+                tweets[doc_id - self._index_base]["text"]
+                for doc_id, _ in self._index.query(tokenize(text), threshold)
             ]
 
     def get_stats(self) -> dict[str, Any]:
@@ -163,8 +279,8 @@ class MemoryEngine:
     def register_ab_test(self, payload: dict[str, Any]) -> None:
         with self._lock:
             self._db["ab_tests"].append(payload)
-            self._db["ab_tests"] = self._db["ab_tests"][-200:]
-            self._save_safe()
+            self._db["ab_tests"] = self._db["ab_tests"][-MAX_AB_TESTS:]
+            self._save_safe([("ab_test", payload)])
 
     def export_json(self) -> dict[str, Any]:
         with self._lock:
@@ -196,9 +312,16 @@ class MemoryEngine:
             return str(target)
 
     def clear(self) -> None:
-        with self._lock:
+        with self._persist_lock, self._lock:
             self._db = self._default_db()
-            self._save_safe()
+            self._pending = []
+            self._rebuild_index()
+            self.store.replace(self._db)
+
+    def close(self) -> None:
+        self.flush()
+        with self._persist_lock, self._lock:
+            self.store.close()
 
 
 memory_engine = MemoryEngine()
@@ -0,0 +1,439 @@
+﻿from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any
+
+from ..core.config import SETTINGS
+from ..core.logger import get_logger
+from ..core.utils import now_ts
+
+logger = get_logger(__name__)
+
+# A mutation applied by MemoryEngine, e.g. ("tweet", row) or ("stat", {...}).
+MemoryOp = tuple[str, dict[str, Any]]
+
+MAX_AB_TESTS = 200
+
+# stats.kind -> key in the in-memory state.
+_STAT_KINDS = {"style": "style_stats", "theme": "theme_heatmap"}
+
+
+class MemoryStore(ABC):
+    """Persistence backend for `MemoryEngine`.
+
+    The engine keeps the whole state in memory and hands every change to `apply`
+    both as a list of ops and as the resulting state, so a backend can either
+    persist the ops (O(rows changed)) or rewrite a snapshot.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def load(self) -> dict[str, Any] | None:
+        """Return the stored state, or None when nothing has been stored yet."""
+
+    @abstractmethod
+    def apply(self, ops: list[MemoryOp], db: dict[str, Any]) -> None:
+        """Persist `ops`; `db` is the state after applying them."""
+
+    @abstractmethod
+    def replace(self, db: dict[str, Any]) -> None:
+        """Overwrite everything with `db` (clear, migration)."""
+
+    def close(self) -> None:
+        return None
+
+
+class JSONMemoryStore(MemoryStore):
+    """Original format: the full state as one pretty-printed JSON file."""
+
+    name = "json"
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Last journal seq folded into the snapshot (journaled subclass); 0 for plain files.
+        self.snapshot_seq = 0
+
+    def load(self) -> dict[str, Any] | None:
+        if not self.path.exists():
+            return None
+        try:
+            payload = json.loads(self.path.read_text(encoding="utf-8"))
+            if not isinstance(payload, dict):
+                raise ValueError("invalid memory format")
+            self.snapshot_seq = int(payload.pop("_journal_seq", 0) or 0)
+            return payload
+        except Exception as exc:  # noqa: BLE001
+            backup = self.path.with_suffix(".corrupted.json")
+            self.path.replace(backup)
+            logger.error("Memory corrupted. Backup saved to %s (%s)", backup, exc)
+            return None
+
+    def apply(self, ops: list[MemoryOp], db: dict[str, Any]) -> None:
+        self.replace(db)
+
+    def replace(self, db: dict[str, Any]) -> None:
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(db, ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp.replace(self.path)
+
+
+class JournaledJSONMemoryStore(JSONMemoryStore):
+    """JSON snapshot plus an append-only journal of ops (one JSON line per mutation).
+
+    Mutations only append to `<path>.journal`; the snapshot is rewritten during
+    compaction (every `compact_every` entries or `compact_interval_sec`, and on close).
+    `load` replays the journal over the snapshot. `fsync` is "always" (every append),
+    "interval" (at most every `fsync_interval_sec`) or "never" (left to the OS).
+
+    Journal entries carry a monotonic `seq` and the snapshot records the last seq it
+    contains, so entries left behind by a crash between the snapshot rename and the
+    journal truncation are skipped instead of applied twice.
+    """
+
+    name = "json_journal"
+
+    def __init__(
+        self,
+        path: str,
+        fsync: str = SETTINGS.memory.journal_fsync,
+        fsync_interval_sec: float = SETTINGS.memory.journal_fsync_interval_sec,
+        compact_every: int = SETTINGS.memory.journal_compact_every,
+        compact_interval_sec: float = SETTINGS.memory.journal_compact_interval_sec,
+        max_tweets: int = SETTINGS.memory.max_tweets,
+        max_history: int = SETTINGS.memory.max_history,
+    ) -> None:
+        super().__init__(path)
+        self.journal_path = self.path.with_suffix(".journal")
+        self.fsync = fsync
+        self.fsync_interval_sec = fsync_interval_sec
+        self.compact_every = max(1, compact_every)
+        self.compact_interval_sec = compact_interval_sec
+        self.max_tweets = max_tweets
+        self.max_history = max_history
+        self._journal: Any = None
+        self._entries = 0
+        self._last_sync = 0.0
+        self._last_compact = now_ts()
+        self._db: dict[str, Any] | None = None
+        self._seq = 0
+        self.compactions = 0
+
+    def load(self) -> dict[str, Any] | None:
+        db = super().load()
+        self._seq = self.snapshot_seq
+        if not self.journal_path.exists():
+            return db
+        db = db or {}
+        replayed = 0
+        with self.journal_path.open("r", encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn last line from a crash mid-append: everything before it is intact.
+                    logger.warning("Memory journal: ignoring truncated entry after %s entries", replayed)
+                    break
+                seq = entry.get("seq")
+                if seq is not None:
+                    if seq <= self.snapshot_seq:
+                        continue
+                    self._seq = max(self._seq, seq)
+                for kind, data in entry.get("ops", []):
+                    self._replay(db, kind, data)
+                db["updated_at"] = entry.get("ts", db.get("updated_at"))
+                replayed += 1
+        if replayed:
+            logger.info("Memory journal: replayed %s entries", replayed)
+            self.replace(db)
+        return db or None
+
+    def apply(self, ops: list[MemoryOp], db: dict[str, Any]) -> None:
+        self._db = db
+        if not ops:
+            return
+        if self._journal is None:
+            self._journal = self.journal_path.open("a", encoding="utf-8")
+        self._seq += 1
+        entry = {"seq": self._seq, "ts": db.get("updated_at", now_ts()), "ops": ops}
+        self._journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._journal.flush()
+        self._entries += 1
+
+        now = now_ts()
+        if self.fsync == "always" or (self.fsync == "interval" and now - self._last_sync >= self.fsync_interval_sec):
+            os.fsync(self._journal.fileno())
+            self._last_sync = now
+
+        if self._entries >= self.compact_every or now - self._last_compact >= self.compact_interval_sec:
+            self.replace(db)
+
+    def replace(self, db: dict[str, Any]) -> None:
+        """Compaction: durable snapshot (tagged with the last journal seq), then an empty journal."""
+        tmp = self.path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as handle:
+            handle.write(json.dumps({**db, "_journal_seq": self._seq}, ensure_ascii=False, indent=2))
+            handle.flush()
+            if self.fsync != "never":
+                os.fsync(handle.fileno())
+        tmp.replace(self.path)
+        self.snapshot_seq = self._seq
+
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        self.journal_path.open("w", encoding="utf-8").close()
+        self._entries = 0
+        self._last_compact = now_ts()
+        self.compactions += 1
+
+    def close(self) -> None:
+        if self._db is not None and self._entries:
+            self.replace(self._db)
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def _replay(self, db: dict[str, Any], kind: str, data: dict[str, Any]) -> None:
+        if kind == "tweet":
+            db["tweets"] = (db.get("tweets", []) + [data])[-self.max_tweets :]
+        elif kind == "history":
+            db["history"] = (db.get("history", []) + [data])[-self.max_history :]
+        elif kind == "favorite":
+            favorites = db.setdefault("favorites", [])
+            if data["tweet_id"] not in favorites:
+                favorites.append(data["tweet_id"])
+        elif kind == "ab_test":
+            db["ab_tests"] = (db.get("ab_tests", []) + [data])[-MAX_AB_TESTS:]
+        elif kind == "stat":
+            stats = db.setdefault(_STAT_KINDS[data["kind"]], {})
+            meta = stats.setdefault(data["key"], {"count": 0, "score_sum": 0.0})
+            meta["count"] += data["count"]
+            meta["score_sum"] += data["score_sum"]
+        else:
+            raise ValueError(f"unknown memory op: {kind}")
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tweets (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL,
+    theme TEXT NOT NULL DEFAULT '',
+    style TEXT NOT NULL DEFAULT '',
+    score REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tweets_id ON tweets (id);
+CREATE INDEX IF NOT EXISTS idx_tweets_theme ON tweets (theme);
+CREATE INDEX IF NOT EXISTS idx_tweets_style ON tweets (style);
+CREATE TABLE IF NOT EXISTS history (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL,
+    theme TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_created ON history (created_at);
+CREATE TABLE IF NOT EXISTS favorites (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    tweet_id TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS ab_tests (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stats (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    score_sum REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (kind, key)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class SQLiteMemoryStore(MemoryStore):
+    """Tables per collection in an SQLite database (WAL), written op by op.
+
+    Only the rows a mutation touches are written. This does not make memory shared
+    between processes: `MemoryEngine` reads the store once at startup and serves
+    from its own copy, so run a single API worker per memory database.
+    """
+
+    name = "sqlite"
+
+    def __init__(
+        self,
+        path: str,
+        max_tweets: int = SETTINGS.memory.max_tweets,
+        max_history: int = SETTINGS.memory.max_history,
+        max_ab_tests: int = MAX_AB_TESTS,
+    ) -> None:
+        self.path = Path(path)
+        self.max_tweets = max_tweets
+        self.max_history = max_history
+        self.max_ab_tests = max_ab_tests
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SQLITE_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def load(self) -> dict[str, Any] | None:
+        with self._lock:
+            conn = self._connect()
+            updated = conn.execute("SELECT value FROM meta WHERE key = 'updated_at'").fetchone()
+            if updated is None:
+                return None
+            db: dict[str, Any] = {
+                "tweets": [json.loads(row["data"]) for row in conn.execute("SELECT data FROM tweets ORDER BY seq")],
+                "favorites": [row["tweet_id"] for row in conn.execute("SELECT tweet_id FROM favorites ORDER BY seq")],
+                "style_stats": {},
+                "theme_heatmap": {},
+                "history": [json.loads(row["data"]) for row in conn.execute("SELECT data FROM history ORDER BY seq")],
+                "ab_tests": [json.loads(row["data"]) for row in conn.execute("SELECT data FROM ab_tests ORDER BY seq")],
+                "updated_at": float(updated["value"]),
+            }
+            for row in conn.execute("SELECT kind, key, count, score_sum FROM stats"):
+                target = _STAT_KINDS.get(row["kind"])
+                if target:
+                    db[target][row["key"]] = {"count": row["count"], "score_sum": row["score_sum"]}
+            return db
+
+    def apply(self, ops: list[MemoryOp], db: dict[str, Any]) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                trim: set[str] = set()
+                for kind, data in ops:
+                    self._apply_op(conn, kind, data)
+                    trim.add(kind)
+                self._trim(conn, trim)
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('updated_at', ?)",
+                    (str(db.get("updated_at", now_ts())),),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def replace(self, db: dict[str, Any]) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for table in ("tweets", "history", "favorites", "ab_tests", "stats", "meta"):
+                    conn.execute(f"DELETE FROM {table}")
+                for row in db.get("tweets", []):
+                    self._apply_op(conn, "tweet", row)
+                for row in db.get("history", []):
+                    self._apply_op(conn, "history", row)
+                for tweet_id in db.get("favorites", []):
+                    self._apply_op(conn, "favorite", {"tweet_id": tweet_id})
+                for row in db.get("ab_tests", []):
+                    self._apply_op(conn, "ab_test", row)
+                for kind, target in _STAT_KINDS.items():
+                    for key, meta in db.get(target, {}).items():
+                        conn.execute(
+                            "INSERT INTO stats (kind, key, count, score_sum) VALUES (?, ?, ?, ?)",
+                            (kind, key, int(meta.get("count", 0)), float(meta.get("score_sum", 0.0))),
+                        )
+                self._trim(conn, {"tweet", "history", "ab_test"})
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('updated_at', ?)",
+                    (str(db.get("updated_at", now_ts())),),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @staticmethod
+    def _apply_op(conn: sqlite3.Connection, kind: str, data: dict[str, Any]) -> None:
+        payload = json.dumps(data, ensure_ascii=False)
+        if kind == "tweet":
+            conn.execute(
+                "INSERT INTO tweets (id, theme, style, score, created_at, data) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    str(data.get("id", "")),
+                    str(data.get("theme", "")),
+                    str(data.get("style", "")),
+                    float(data.get("score", 0.0)),
+                    float(data.get("created_at", 0.0)),
+                    payload,
+                ),
+            )
+        elif kind == "history":
+            conn.execute(
+                "INSERT INTO history (id, theme, created_at, data) VALUES (?, ?, ?, ?)",
+                (str(data.get("id", "")), str(data.get("theme", "")), float(data.get("created_at", 0.0)), payload),
+            )
+        elif kind == "favorite":
+            conn.execute("INSERT OR IGNORE INTO favorites (tweet_id) VALUES (?)", (data["tweet_id"],))
+        elif kind == "ab_test":
+            conn.execute(
+                "INSERT INTO ab_tests (id, created_at, data) VALUES (?, ?, ?)",
+                (str(data.get("id", "")), float(data.get("created_at", 0.0)), payload),
+            )
+        elif kind == "stat":
+            conn.execute(
+                "INSERT INTO stats (kind, key, count, score_sum) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (kind, key) DO UPDATE SET"
+                " count = count + excluded.count, score_sum = score_sum + excluded.score_sum",
+                (data["kind"], data["key"], int(data["count"]), float(data["score_sum"])),
+            )
+        else:
+            raise ValueError(f"unknown memory op: {kind}")
+
+    def _trim(self, conn: sqlite3.Connection, kinds: set[str]) -> None:
+        limits = {
+            "tweet": ("tweets", self.max_tweets),
+            "history": ("history", self.max_history),
+            "ab_test": ("ab_tests", self.max_ab_tests),
+        }
+        for kind in kinds & limits.keys():
+            table, limit = limits[kind]
+            conn.execute(
+                f"DELETE FROM {table} WHERE seq <= (SELECT MAX(seq) FROM {table}) - ?",
+                (limit,),
+            )
+
+
+def build_memory_store(backend: str | None = None, path: str | None = None) -> MemoryStore:
+    backend = backend or SETTINGS.memory.backend
+    if backend == "sqlite":
+        return SQLiteMemoryStore(path or SETTINGS.memory.sqlite_path)
+    if backend == "json":
+        if SETTINGS.memory.journal_enabled:
+            return JournaledJSONMemoryStore(path or SETTINGS.memory.path)
+        return JSONMemoryStore(path or SETTINGS.memory.path)
+    raise ValueError(f"unknown memory backend: {backend}")
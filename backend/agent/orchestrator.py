@@ -1,45 +1,160 @@
 ﻿from __future__ import annotations
 
+import asyncio
+import math
+import statistics
+from collections.abc import AsyncIterator
 from pathlib import Path
+from typing import Any
 
-from ..core.cache import cache
+from ..core.config import SETTINGS
 from ..core.logger import get_logger
+from ..core.singleflight import SingleFlight
 from ..core.utils import now_ts
 from ..models.trend import Trend
-from ..models.tweet import ABTestRequest, ABTestResult, GenerateTweetsRequest, GenerateTweetsResponse
+from ..models.tweet import (
+    ABTestRequest,
+    ABTestResult,
+    ABVariantResult,
+    GenerateTweetsRequest,
+    GenerateTweetsResponse,
+    TweetCandidate,
+)
+from ..providers import router
 from .generator import generator
 from .memory_engine import memory_engine
 from .remix_engine import remix_engine
 from .scoring import scoring_engine
 from .trend_analyzer import trend_analyzer
+from .trend_refresher import TrendRefresher
+from .trend_store import trend_store
 
 logger = get_logger(__name__)
 
 
 class EditorialOrchestrator:
+    def __init__(self) -> None:
+        # Concurrent identical generations / trend refreshes share one in-flight call.
+        self.flights = SingleFlight()
+        self.refresher = TrendRefresher(self._refresh_trends)
+        self._warmup: asyncio.Task | None = None
+
+    def start_trends(self) -> None:
+        """Warm start: serve the on-disk snapshot at once, fetch from the network in the background."""
+        cfg = SETTINGS.sources
+        if trend_store.load_snapshot(cfg.trend_snapshot_path, cfg.trend_snapshot_max_age_sec):
+            logger.info("Loaded %s trends from snapshot", trend_store.stats()["size"])
+        if cfg.trend_refresh_enabled:
+            self.refresher.start()
+        elif self._warmup is None:
+            self._warmup = asyncio.create_task(self.refresher.refresh_once())
+
+    async def stop_trends(self) -> None:
+        await self.refresher.stop()
+        warmup, self._warmup = self._warmup, None
+        if warmup is not None and not warmup.done():
+            warmup.cancel()
+            await asyncio.gather(warmup, return_exceptions=True)
+
+    def trends_state(self) -> str:
+        """Readiness of the trend set: `ready` once trends can be served (snapshot or fetch),
+        `degraded` when the first fetch finished without any, `starting` until then."""
+        if trend_store.has_data():
+            return "ready"
+        return "degraded" if self.refresher.attempts > 0 else "starting"
+
     async def fetch_trends(self, limit: int = 40, force_refresh: bool = False) -> list[Trend]:
-        if not force_refresh:
-            cached = cache.get("trends")
-            if cached:
-                return cached[:limit]
+        # Always fetch at least the pool size so one refresh serves every smaller limit.
+        if force_refresh:
+            await self._refresh_trends(max(limit, SETTINGS.sources.trend_pool_size), keep_stale=True)
+        elif not trend_store.covers(limit):
+            if trend_store.has_data() and self.refresher.running:
+                # Stale-while-revalidate: answer from the last good set, refresh in the background.
+                self.refresher.trigger(limit)
+            else:
+                await self._refresh_trends(max(limit, SETTINGS.sources.trend_pool_size), keep_stale=True)
+        return trend_store.top(limit)
 
+    async def _refresh_trends(self, limit: int, keep_stale: bool = False) -> None:
+        try:
+            await self.flights.do(f"trends:{limit}", lambda: self._load_trends(limit))
+        except Exception:
+            if not (keep_stale and trend_store.has_data()):
+                raise
+            logger.exception("trend refresh failed, serving the previous set")
+
+    async def _load_trends(self, limit: int) -> list[Trend]:
         trends = await trend_analyzer.fetch_trends(limit=limit)
-        cache.set("trends", trends)
+        if not trends and trend_store.has_data():
+            # Every source failed or came back empty: keep the last good set.
+            raise RuntimeError("all trend sources returned no trends")
+        trend_store.replace(trends, fetched_limit=limit)
+        try:
+            await asyncio.to_thread(trend_store.save_snapshot, SETTINGS.sources.trend_snapshot_path)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("trend snapshot write failed: %s", exc)
         return trends
 
+    async def find_trend(self, trend_id: str) -> Trend | None:
+        """O(1) lookup in the trend store; only refreshes when the store is empty or stale."""
+        trend = trend_store.get(trend_id)
+        if trend is None and not trend_store.is_fresh():
+            await self.fetch_trends(limit=SETTINGS.sources.trend_pool_size)
+            trend = trend_store.get(trend_id)
+        return trend
+
     async def analyze_trend(self, trend_id: str) -> tuple[Trend | None, list[str], str]:
-        trends = await self.fetch_trends(limit=80)
-        trend = next((item for item in trends if item.id == trend_id), None)
+        trend = await self.find_trend(trend_id)
         if not trend:
             return None, [], "Trend introuvable"
         angles, reason = trend_analyzer.analyze_angles(trend)
         return trend, angles, reason
 
     async def generate(self, request: GenerateTweetsRequest) -> GenerateTweetsResponse:
+        key = f"generate:{request.model_dump_json()}"
+        return await self.flights.do(key, lambda: self._generate(request))
+
+    async def _generate(self, request: GenerateTweetsRequest) -> GenerateTweetsResponse:
         trend = await self._resolve_trend(request)
         candidates = await generator.generate_candidates(request=request, trend=trend)
-        ranked = scoring_engine.rank(candidates)
+        return self._finalize(request, trend, scoring_engine.rank(candidates))
+
+    async def generate_many(self, requests: list[GenerateTweetsRequest]) -> list[GenerateTweetsResponse]:
+        """Generate for several requests, packing their trends into batched prompts."""
+        trends = [await self._resolve_trend(request) for request in requests]
+        batches = await generator.generate_batch(list(zip(requests, trends)))
+        return [
+            self._finalize(request, trend, scoring_engine.rank(candidates))
+            for request, trend, candidates in zip(requests, trends, batches)
+        ]
+
+    async def generate_stream(self, request: GenerateTweetsRequest) -> AsyncIterator[tuple[str, dict[str, Any]]]:
+        """Yield `(event, payload)` pairs: trend, candidate/score per parsed tweet, remixes, done."""
+        trend = await self._resolve_trend(request)
+        yield "trend", trend.model_dump()
 
+        scored: list[TweetCandidate] = []
+        async for candidate in generator.stream_candidates(request=request, trend=trend):
+            scored.append(scoring_engine.score(candidate))
+            yield "candidate", candidate.model_dump()
+            leaders = sorted(scored, key=lambda t: t.score, reverse=True)[:3]
+            yield "score", {
+                "count": len(scored),
+                "top3": [{"id": tweet.id, "score": tweet.score} for tweet in leaders],
+            }
+
+        ranked = sorted(scored, key=lambda t: t.score, reverse=True)
+        response = self._finalize(request, trend, ranked)
+        if response.remixes:
+            yield "remixes", {"remixes": [remix.model_dump() for remix in response.remixes]}
+        yield "done", response.model_dump()
+
+    def _finalize(
+        self,
+        request: GenerateTweetsRequest,
+        trend: Trend,
+        ranked: list[TweetCandidate],
+    ) -> GenerateTweetsResponse:
         remixes = []
         if request.include_remix and ranked:
             remixes = [remix_engine.remix(tweet) for tweet in ranked[:2]]
@@ -74,49 +189,95 @@ class EditorialOrchestrator:
         return GenerateTweetsResponse(top3=top3, all_candidates=ranked, remixes=remixes, metadata=metadata)
 
     async def run_ab_test(self, request: ABTestRequest) -> ABTestResult:
-        req_a = GenerateTweetsRequest(
-            trend_text=request.trend_text,
-            theme=request.theme,
-            style=request.variant_a_style,
-            count=request.samples,
-            include_remix=False,
-            draft_mode=True,
-        )
-        req_b = GenerateTweetsRequest(
+        """Generate every variant x trial concurrently; memory is written once at the end."""
+        styles = request.styles()
+        labels = [chr(ord("A") + index) for index in range(len(styles))]
+        base = GenerateTweetsRequest(
             trend_text=request.trend_text,
             theme=request.theme,
-            style=request.variant_b_style,
             count=request.samples,
             include_remix=False,
             draft_mode=True,
+            # Repeated trials must not be answered from the response cache.
+            bypass_cache=request.trials > 1,
         )
+        trend = await self._resolve_trend(base)
+
+        # At most as many trials in flight as the provider has slots, so one A/B/n request
+        # never fills the provider queue on its own.
+        semaphore = asyncio.Semaphore(router.concurrency())
+
+        async def run_trial(style: str) -> list[TweetCandidate]:
+            async with semaphore:
+                variant = base.model_copy(update={"style": style})
+                candidates = await generator.generate_candidates(request=variant, trend=trend)
+                return scoring_engine.rank(candidates)
 
-        result_a = await self.generate(req_a)
-        result_b = await self.generate(req_b)
+        tasks = [asyncio.create_task(run_trial(style)) for style in styles for _ in range(request.trials)]
+        try:
+            runs = await asyncio.gather(*tasks)
+        except BaseException:
+            # First failure (or cancellation) ends the test: stop the sibling trials too.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
 
-        avg_a = sum(tweet.score for tweet in result_a.top3) / len(result_a.top3)
-        avg_b = sum(tweet.score for tweet in result_b.top3) / len(result_b.top3)
-        winner = "A" if avg_a >= avg_b else "B"
+        variants: list[ABVariantResult] = []
+        for index, (label, style) in enumerate(zip(labels, styles)):
+            trials = runs[index * request.trials : (index + 1) * request.trials]
+            scores = [sum(tweet.score for tweet in ranked[:3]) / len(ranked[:3]) for ranked in trials]
+            best = scoring_engine.rank([tweet for ranked in trials for tweet in ranked[:3]])
+            variants.append(
+                ABVariantResult(
+                    label=label,
+                    style=style,
+                    avg_score=round(statistics.fmean(scores), 4),
+                    trial_scores=[round(score, 4) for score in scores],
+                    stdev=round(statistics.stdev(scores), 4) if len(scores) > 1 else 0.0,
+                    top=best[:3],
+                )
+            )
+
+        leaders = sorted(variants, key=lambda v: v.avg_score, reverse=True)
+        winner = leaders[0]
+        z_score = None
+        if request.trials > 1:
+            spread = math.sqrt((winner.stdev**2 + leaders[1].stdev**2) / request.trials)
+            z_score = round((winner.avg_score - leaders[1].avg_score) / spread, 3) if spread else None
 
+        memory_engine.register_generation(
+            theme=request.theme,
+            trend_text=trend.title,
+            tweets=[tweet for variant in variants for tweet in variant.top],
+            draft_mode=True,
+        )
         payload = {
             "id": f"ab-{int(now_ts() * 1000)}",
-            "winner": winner,
+            "winner": winner.label,
             "theme": request.theme,
             "trend_text": request.trend_text,
-            "variant_a_style": request.variant_a_style,
-            "variant_b_style": request.variant_b_style,
-            "variant_a_avg_score": round(avg_a, 4),
-            "variant_b_avg_score": round(avg_b, 4),
+            "variant_a_style": variants[0].style,
+            "variant_b_style": variants[1].style,
+            "variant_a_avg_score": variants[0].avg_score,
+            "variant_b_avg_score": variants[1].avg_score,
+            "variants": [{"label": v.label, "style": v.style, "avg_score": v.avg_score} for v in variants],
+            "trials": request.trials,
+            "z_score": z_score,
             "created_at": now_ts(),
         }
         memory_engine.register_ab_test(payload)
 
         return ABTestResult(
-            winner=winner,
-            variant_a_avg_score=round(avg_a, 4),
-            variant_b_avg_score=round(avg_b, 4),
-            variant_a_top=result_a.top3,
-            variant_b_top=result_b.top3,
+            winner=winner.label,
+            variant_a_avg_score=variants[0].avg_score,
+            variant_b_avg_score=variants[1].avg_score,
+            variant_a_top=variants[0].top,
+            variant_b_top=variants[1].top,
+            variants=variants,
+            trials=request.trials,
+            z_score=z_score,
+            confident=(z_score is not None and z_score >= 1.96) if request.trials > 1 else None,
         )
 
     async def export_csv(self) -> str:
@@ -125,8 +286,7 @@ class EditorialOrchestrator:
 
     async def _resolve_trend(self, request: GenerateTweetsRequest) -> Trend:
         if request.trend_id:
-            trends = await self.fetch_trends(limit=80)
-            found = next((item for item in trends if item.id == request.trend_id), None)
+            found = await self.find_trend(request.trend_id)
             if found:
                 return found
 
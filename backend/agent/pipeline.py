@@ -0,0 +1,93 @@
+﻿from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any
+
+from ..core.config import SETTINGS
+from ..core.logger import get_logger
+from ..models.trend import Trend
+from ..models.tweet import GenerateTweetsRequest
+from .orchestrator import orchestrator
+
+logger = get_logger(__name__)
+
+
+class PipelineRunner:
+    """Runs the trend -> tweets pipeline with bounded concurrency and per-unit deadlines.
+
+    A unit is one trend, or one group of trends when batched prompts are used. A
+    unit that fails or misses its deadline is reported in `failed` instead of
+    failing the whole run. Background runs are `pipeline` jobs on the job queue.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = SETTINGS.generation.pipeline_concurrency,
+        trend_timeout_sec: float = SETTINGS.generation.pipeline_trend_timeout_sec,
+    ) -> None:
+        self.concurrency = max(1, concurrency)
+        self.trend_timeout_sec = trend_timeout_sec
+
+    async def run(self, num_trends: int = 5, tweets_per_trend: int = 9, batched: bool = True) -> dict[str, Any]:
+        started = time.perf_counter()
+        trends = await orchestrator.fetch_trends(limit=num_trends)
+        requests = [
+            GenerateTweetsRequest(
+                trend_id=trend.id,
+                theme=trend.theme,
+                style="insight",
+                count=tweets_per_trend,
+                include_remix=True,
+                draft_mode=False,
+            )
+            for trend in trends
+        ]
+
+        size = max(1, SETTINGS.generation.batch_max_trends) if batched else 1
+        units = [list(range(start, min(start + size, len(trends)))) for start in range(0, len(trends), size)]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        runs: list[dict[str, Any] | None] = [None] * len(trends)
+        failed: list[dict[str, Any]] = []
+
+        async def run_unit(indexes: list[int]) -> None:
+            async with semaphore:
+                try:
+                    # On deadline wait_for cancels the generation itself (SingleFlight cancels
+                    # work left without waiters), so the semaphore really bounds running work.
+                    if len(indexes) == 1:
+                        coro = orchestrator.generate(requests[indexes[0]])
+                        results = [await asyncio.wait_for(coro, timeout=self.trend_timeout_sec)]
+                    else:
+                        coro = orchestrator.generate_many([requests[i] for i in indexes])
+                        results = await asyncio.wait_for(coro, timeout=self.trend_timeout_sec)
+                except Exception as exc:  # noqa: BLE001
+                    error = "deadline_exceeded" if isinstance(exc, asyncio.TimeoutError) else repr(exc)[:300]
+                    logger.warning("pipeline unit failed (%s trends): %s", len(indexes), error)
+                    failed.extend(self._failure(trends[i], error) for i in indexes)
+                    return
+            for i, result in zip(indexes, results):
+                runs[i] = {
+                    "trend_id": trends[i].id,
+                    "trend_title": trends[i].title,
+                    "top3": [tweet.model_dump() for tweet in result.top3],
+                }
+
+        await asyncio.gather(*(run_unit(indexes) for indexes in units))
+
+        completed = [run for run in runs if run is not None]
+        status = "ok" if not failed else ("partial" if completed else "failed")
+        return {
+            "status": status,
+            "trends": len(trends),
+            "runs": completed,
+            "failed": failed,
+            "elapsed_sec": round(time.perf_counter() - started, 3),
+        }
+
+    @staticmethod
+    def _failure(trend: Trend, error: str) -> dict[str, Any]:
+        return {"trend_id": trend.id, "trend_title": trend.title, "error": error}
+
+
+pipeline_runner = PipelineRunner()
@@ -0,0 +1,71 @@
+﻿from __future__ import annotations
+
+import math
+
+from ..core.utils import jaccard_tokens
+
+
+class TokenIndex:
+    """Inverted index (token -> doc ids) answering Jaccard threshold queries.
+
+    Only documents sharing one of the query's rarest tokens are looked at (prefix
+    filtering): a document with similarity >= t shares at least ceil(t * |q|) tokens
+    with the query, so it must contain one of the |q| - ceil(t * |q|) + 1 rarest ones.
+    Candidates are then checked with the exact Jaccard score.
+    """
+
+    def __init__(self) -> None:
+        self._postings: dict[str, set[int]] = {}
+        self._docs: dict[int, frozenset[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, doc_id: int, tokens: frozenset[str]) -> None:
+        self._docs[doc_id] = tokens
+        for token in tokens:
+            self._postings.setdefault(token, set()).add(doc_id)
+
+    def remove(self, doc_id: int) -> None:
+        tokens = self._docs.pop(doc_id, None)
+        if tokens is None:
+            return
+        for token in tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            posting.discard(doc_id)
+            if not posting:
+                del self._postings[token]
+
+    def clear(self) -> None:
+        self._postings.clear()
+        self._docs.clear()
+
+    def query(self, tokens: frozenset[str], threshold: float) -> list[tuple[int, float]]:
+        """Return `(doc_id, score)` with score >= threshold, best first (newest first on ties)."""
+        if not tokens or threshold <= 0:
+            return []
+        required = max(1, math.ceil(threshold * len(tokens)))
+        ranked = sorted(tokens, key=lambda token: len(self._postings.get(token, ())))
+        prefix = ranked[: len(tokens) - required + 1]
+
+        min_size = threshold * len(tokens)
+        max_size = len(tokens) / threshold
+        candidates: set[int] = set()
+        for token in prefix:
+            candidates.update(self._postings.get(token, ()))
+
+        hits: list[tuple[int, float]] = []
+        for doc_id in candidates:
+            doc = self._docs[doc_id]
+            if not min_size <= len(doc) <= max_size:
+                continue
+            score = jaccard_tokens(tokens, doc)
+            if score >= threshold:
+                hits.append((doc_id, score))
+        hits.sort(key=lambda hit: (hit[1], hit[0]), reverse=True)
+        return hits
+
+    def stats(self) -> dict[str, int]:
+        return {"documents": len(self._docs), "tokens": len(self._postings)}
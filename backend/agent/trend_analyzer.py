@@ -1,13 +1,18 @@
 ﻿from __future__ import annotations
 
 import asyncio
-import re
+import math
+from collections import OrderedDict
+from urllib.parse import urlparse
 
 from ..core.config import SETTINGS
 from ..core.logger import get_logger
-from ..core.utils import jaccard_similarity
-from ..models.trend import Trend
+from ..core.utils import jaccard_similarity, now_ts, words
+from ..models.trend import Trend, TrendMember
 from ..sources import newsapi_source, reddit_source, rss_source, twitter_trends_source, youtube_trends_source
+from ..sources.validators import source_validators
+from .keyword_matcher import KeywordMatcher, TextFeatures
+from .lsh import LSHClusterer, shingles
 
 logger = get_logger(__name__)
 
@@ -29,14 +34,23 @@ class TrendAnalyzer:
         "Futur": ["future", "forecast", "2030", "tomorrow", "trend"],
     }
 
-    ANGLE_PATTERNS: dict[str, str] = {
-        "contradiction": r"\b(but|however|yet|paradox|while)\b",
-        "urgence": r"\b(urgent|alert|breaking|crisis|warning)\b",
-        "chiffres": r"\b\d+\b",
-        "question": r"\?",
-        "surprise": r"\b(unexpected|shocking|never|first|record)\b",
+    # Checked in this order; "chiffres" (standalone numbers) and "question" ("?")
+    # are detected by the matcher itself rather than by keywords.
+    ANGLE_KEYWORDS: dict[str, list[str]] = {
+        "contradiction": ["but", "however", "yet", "paradox", "while"],
+        "urgence": ["urgent", "alert", "breaking", "crisis", "warning"],
+        "chiffres": [],
+        "question": [],
+        "surprise": ["unexpected", "shocking", "never", "first", "record"],
     }
 
+    ENRICH_CACHE_SIZE = 4096
+
+    def __init__(self) -> None:
+        self.matcher = KeywordMatcher(self.THEME_KEYWORDS, self.ANGLE_KEYWORDS)
+        # (title, summary) -> (theme, viral_angle, momentum boost); unchanged feeds repeat the same items.
+        self._enrichments: OrderedDict[tuple[str, str], tuple[str, str, float]] = OrderedDict()
+
     async def fetch_trends(self, limit: int = 40) -> list[Trend]:
         tasks = [
             rss_source.fetch(limit=limit),
@@ -57,54 +71,134 @@ class TrendAnalyzer:
                 logger.warning("source bucket error: %s", bucket)
                 continue
             merged.extend(bucket)
+        await asyncio.to_thread(source_validators.save)
 
         enriched = [self._enrich(trend) for trend in merged]
-        deduped = self._dedupe(enriched)
-        ranked = sorted(deduped, key=lambda t: t.momentum, reverse=True)
+        stories = self._merge_stories(enriched)
+        ranked = sorted(stories, key=lambda t: t.momentum, reverse=True)
         return ranked[:limit]
 
     def analyze_angles(self, trend: Trend) -> tuple[list[str], str]:
         text = f"{trend.title} {trend.summary}".lower()
-        detected = [name for name, pattern in self.ANGLE_PATTERNS.items() if re.search(pattern, text)]
+        detected = self.matcher.scan(text).angles
         if not detected:
             detected = ["insight", "opinion", "mirror"]
         reason = f"Angles détectés: {', '.join(detected)}"
         return detected, reason
 
     def _enrich(self, trend: Trend) -> Trend:
-        text = f"{trend.title} {trend.summary}".lower()
-        trend.theme = self._detect_theme(text)
-        trend.viral_angle = self._detect_primary_angle(text)
-        trend.momentum = max(0.25, trend.momentum) + self._momentum_boost(text)
+        key = (trend.title, trend.summary)
+        cached = self._enrichments.get(key)
+        if cached is None:
+            features = self.matcher.scan(f"{trend.title} {trend.summary}".lower())
+            angle = features.angles[0] if features.angles else "insight"
+            cached = (self._detect_theme(features), angle, self._momentum_boost(features))
+            self._enrichments[key] = cached
+            if len(self._enrichments) > self.ENRICH_CACHE_SIZE:
+                self._enrichments.popitem(last=False)
+        else:
+            self._enrichments.move_to_end(key)
+        trend.theme, trend.viral_angle, boost = cached
+        trend.momentum = max(0.25, trend.momentum) + boost
         return trend
 
-    def _detect_theme(self, text: str) -> str:
+    def _detect_theme(self, features: TextFeatures) -> str:
         # If no clear signal, default to a neutral bucket instead of forcing IA.
         best_theme = "Faits surprenants"
         best_hits = 0
-        for theme, keywords in self.THEME_KEYWORDS.items():
-            hits = sum(1 for kw in keywords if kw in text)
+        for theme in self.THEME_KEYWORDS:
+            hits = features.theme_hits.get(theme, 0)
             if hits > best_hits:
                 best_hits = hits
                 best_theme = theme
         return best_theme
 
-    def _detect_primary_angle(self, text: str) -> str:
-        for angle, pattern in self.ANGLE_PATTERNS.items():
-            if re.search(pattern, text):
-                return angle
-        return "insight"
-
-    def _momentum_boost(self, text: str) -> float:
-        has_number = 1 if re.search(r"\d", text) else 0
-        has_urgency = 1 if re.search(self.ANGLE_PATTERNS["urgence"], text) else 0
-        has_surprise = 1 if re.search(self.ANGLE_PATTERNS["surprise"], text) else 0
+    def _momentum_boost(self, features: TextFeatures) -> float:
+        has_number = 1 if features.has_digit else 0
+        has_urgency = 1 if "urgence" in features.angles else 0
+        has_surprise = 1 if "surprise" in features.angles else 0
         return (0.12 * has_number) + (0.2 * has_urgency) + (0.18 * has_surprise)
 
-    def _dedupe(self, trends: list[Trend]) -> list[Trend]:
+    def _merge_stories(self, trends: list[Trend]) -> list[Trend]:
+        """Collapse each near-duplicate cluster into one story trend.
+
+        The member with the highest momentum represents the story; the others are
+        listed in `members` and their coverage feeds the story momentum.
+        """
+        now = now_ts()
+        stories: list[Trend] = []
+        for cluster in self._cluster(trends):
+            group = [trends[index] for index in cluster]
+            head = max(group, key=lambda trend: trend.momentum)
+            others = [trend for trend in group if trend is not head]
+
+            head.members = [
+                TrendMember(
+                    id=trend.id,
+                    title=trend.title,
+                    source=trend.source,
+                    source_url=trend.source_url,
+                    published_at=trend.published_at,
+                )
+                for trend in others
+            ]
+            urls = [trend.source_url for trend in others]
+            head.related_urls = list(dict.fromkeys(url for url in urls if url and url != head.source_url))
+            head.sources = list(dict.fromkeys(self._outlet(trend) for trend in group))
+            head.engagement = sum(trend.engagement for trend in group)
+            published = [trend.published_at for trend in group if trend.published_at]
+            head.published_at = max(published) if published else None
+            head.momentum = self._story_momentum(head, now)
+            stories.append(head)
+        return stories
+
+    def _story_momentum(self, story: Trend, now: float) -> float:
+        cfg = SETTINGS.sources
+        extra_sources = min(max(0, len(story.sources) - 1), cfg.story_max_extra_sources)
+        if story.published_at:
+            age_hours = max(0.0, now - story.published_at) / 3600.0
+            freshness = 0.5 ** (age_hours / max(cfg.story_recency_half_life_hours, 1e-6))
+        else:
+            # Undated items (Google Trends, most Reddit mirrors) sit halfway.
+            freshness = 0.5
+        # log10(1 + ups) / 5 saturates around 100k upvotes.
+        engagement = min(1.0, math.log10(1.0 + max(0.0, story.engagement)) / 5.0)
+        momentum = (
+            story.momentum
+            + cfg.story_source_boost * extra_sources
+            + cfg.story_recency_weight * freshness
+            + cfg.story_engagement_weight * engagement
+        )
+        return round(momentum, 4)
+
+    @staticmethod
+    def _outlet(trend: Trend) -> str:
+        host = urlparse(trend.source_url).hostname or ""
+        return host.removeprefix("www.") or trend.source
+
+    def _cluster(self, trends: list[Trend]) -> list[list[int]]:
+        cfg = SETTINGS.sources
+        thresholds = [cfg.dedupe_threshold]
+        if cfg.dedupe_use_summary:
+            thresholds.append(cfg.dedupe_summary_threshold)
+
+        fields: list[list[frozenset[str]]] = []
+        for trend in trends:
+            row = [shingles(words(trend.title), cfg.dedupe_shingle_size)]
+            if cfg.dedupe_use_summary:
+                # Short or empty summaries (Reddit link posts) carry no signal.
+                summary = words(trend.summary)
+                row.append(shingles(summary, cfg.dedupe_shingle_size) if len(summary) >= 8 else frozenset())
+            fields.append(row)
+
+        return LSHClusterer(bands=cfg.dedupe_bands, rows=cfg.dedupe_rows).cluster(fields, thresholds)
+
+    @staticmethod
+    def _dedupe_pairwise(trends: list[Trend], threshold: float = 0.75) -> list[Trend]:
+        """Previous O(n^2) title-only dedupe, kept as the reference for `bench-dedupe`."""
         kept: list[Trend] = []
         for trend in trends:
-            if any(jaccard_similarity(trend.title, existing.title) >= 0.75 for existing in kept):
+            if any(jaccard_similarity(trend.title, existing.title) >= threshold for existing in kept):
                 continue
             kept.append(trend)
         return kept
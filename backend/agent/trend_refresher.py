@@ -0,0 +1,123 @@
+﻿from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from ..core.config import SETTINGS
+from ..core.logger import get_logger
+from ..core.utils import now_ts
+from .trend_store import trend_store
+
+logger = get_logger(__name__)
+
+
+class TrendRefresher:
+    """Background task refreshing the trend store ahead of its expiry.
+
+    Requests keep reading the last good set (stale-while-revalidate) and only
+    `trigger()` a refresh; a failed refresh leaves the previous set in place and
+    is retried with exponential backoff, capped at the regular interval.
+    """
+
+    def __init__(
+        self,
+        refresh: Callable[[int], Awaitable[Any]],
+        pool_size: int = SETTINGS.sources.trend_pool_size,
+        interval_sec: float = SETTINGS.sources.trend_refresh_interval_sec,
+        retry_sec: float = SETTINGS.sources.trend_refresh_retry_sec,
+    ) -> None:
+        self._refresh = refresh
+        self.pool_size = pool_size
+        self.interval_sec = max(1.0, interval_sec)
+        self.retry_sec = max(1.0, retry_sec)
+        self._task: asyncio.Task | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._wanted_limit = 0
+        self.refreshes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_duration_sec = 0.0
+        self.last_error = ""
+
+    @property
+    def attempts(self) -> int:
+        return self.refreshes + self.failures
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def trigger(self, limit: int = 0) -> None:
+        """Ask the loop to refresh now (wide enough for `limit`); no-op when it is not running."""
+        if self._wakeup is not None:
+            self._wanted_limit = max(self._wanted_limit, limit)
+            self._wakeup.set()
+
+    async def refresh_once(self, limit: int | None = None) -> bool:
+        started = now_ts()
+        try:
+            await self._refresh(max(limit or 0, self.pool_size))
+        except Exception as exc:  # noqa: BLE001
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = repr(exc)[:300]
+            logger.warning("trend refresh failed (%s in a row), serving previous set: %r", self.consecutive_failures, exc)
+            return False
+        finally:
+            self.last_duration_sec = now_ts() - started
+        self.refreshes += 1
+        self.consecutive_failures = 0
+        self.last_error = ""
+        return True
+
+    def _next_delay(self) -> float:
+        if self.consecutive_failures:
+            return min(self.interval_sec, self.retry_sec * 2 ** (self.consecutive_failures - 1))
+        # Counted from the store, so request-driven refreshes also push the next one back.
+        return max(0.0, self.interval_sec - (now_ts() - trend_store.updated_at))
+
+    async def _loop(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            triggered = True
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._next_delay())
+            except asyncio.TimeoutError:
+                triggered = False
+            self._wakeup.clear()
+            limit, self._wanted_limit = self._wanted_limit, 0
+            # Triggers queued while the previous refresh ran are usually already satisfied.
+            if triggered and trend_store.covers(max(limit, 1)):
+                continue
+            await self.refresh_once(limit)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        self._wakeup = None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    def stats(self) -> dict[str, Any]:
+        updated_at = trend_store.updated_at
+        return {
+            "running": self.running,
+            "interval_sec": self.interval_sec,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "last_refresh_age_sec": round(now_ts() - updated_at, 1) if updated_at else None,
+            "last_duration_sec": round(self.last_duration_sec, 3),
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,171 @@
+﻿from __future__ import annotations
+
+import json
+import threading
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Any
+
+from ..core.config import SETTINGS
+from ..core.logger import get_logger
+from ..core.utils import now_ts
+from ..models.trend import Trend
+
+logger = get_logger(__name__)
+
+
+class TrendStore:
+    """Latest ranked trend set, indexed by id.
+
+    Every refresh stores the full ranked list; callers slice it to their `limit`.
+    Trends that dropped out of the current window stay resolvable by id for
+    `retention_sec` (bounded by `retention_max`), so an id handed out by an earlier
+    fetch still finds its trend after a refresh.
+    """
+
+    def __init__(
+        self,
+        ttl_sec: float = SETTINGS.cache.ttl_seconds,
+        retention_sec: float = SETTINGS.sources.trend_retention_sec,
+        retention_max: int = SETTINGS.sources.trend_retention_max,
+    ) -> None:
+        self.ttl_sec = ttl_sec
+        self.retention_sec = retention_sec
+        self.retention_max = max(0, retention_max)
+        self._ranked: list[Trend] = []
+        self._by_id: dict[str, Trend] = {}
+        self._retained: OrderedDict[str, tuple[Trend, float]] = OrderedDict()
+        self._fetched_limit = 0
+        self._updated_at = 0.0
+        self._origin = ""
+        self._lock = threading.Lock()
+
+    def replace(
+        self,
+        trends: list[Trend],
+        fetched_limit: int,
+        updated_at: float | None = None,
+        origin: str = "network",
+    ) -> None:
+        """Install a freshly ranked set; `fetched_limit` is the limit it was fetched with."""
+        now = updated_at or now_ts()
+        with self._lock:
+            # Outgoing trends move to the retention map; current ones are served from `_by_id`.
+            for trend in self._ranked:
+                self._retained[trend.id] = (trend, now)
+                self._retained.move_to_end(trend.id)
+            self._ranked = list(trends)
+            self._by_id = {trend.id: trend for trend in trends}
+            self._fetched_limit = fetched_limit
+            self._updated_at = now
+            self._origin = origin
+            for trend_id in self._by_id:
+                self._retained.pop(trend_id, None)
+            self._prune(now)
+
+    def top(self, limit: int) -> list[Trend]:
+        with self._lock:
+            return self._ranked[:limit]
+
+    def get(self, trend_id: str) -> Trend | None:
+        with self._lock:
+            trend = self._by_id.get(trend_id)
+            if trend is not None:
+                return trend
+            entry = self._retained.get(trend_id)
+            if entry is None:
+                return None
+            if now_ts() - entry[1] > self.retention_sec:
+                self._retained.pop(trend_id, None)
+                return None
+            return entry[0]
+
+    @property
+    def updated_at(self) -> float:
+        return self._updated_at
+
+    def has_data(self) -> bool:
+        with self._lock:
+            return bool(self._updated_at)
+
+    def is_fresh(self) -> bool:
+        with self._lock:
+            return bool(self._updated_at) and now_ts() - self._updated_at <= self.ttl_sec
+
+    def covers(self, limit: int) -> bool:
+        """True when the current set is fresh and was fetched wide enough for `limit`."""
+        with self._lock:
+            if not self._updated_at or now_ts() - self._updated_at > self.ttl_sec:
+                return False
+            # A short result for a large fetch means the sources ran dry, not a narrow fetch.
+            return self._fetched_limit >= limit or len(self._ranked) < self._fetched_limit
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ranked = []
+            self._by_id = {}
+            self._retained.clear()
+            self._fetched_limit = 0
+            self._updated_at = 0.0
+            self._origin = ""
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._ranked),
+                "fetched_limit": self._fetched_limit,
+                "origin": self._origin or None,
+                "retained": len(self._retained),
+                "sources": dict(Counter(trend.source for trend in self._ranked)),
+                "age_sec": round(now_ts() - self._updated_at, 1) if self._updated_at else None,
+            }
+
+    def save_snapshot(self, path: str | Path) -> None:
+        """Write the current set to disk (atomic replace) for the next warm start."""
+        with self._lock:
+            if not self._updated_at:
+                return
+            payload = {
+                "saved_at": self._updated_at,
+                "fetched_limit": self._fetched_limit,
+                "trends": [trend.model_dump() for trend in self._ranked],
+            }
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_suffix(".tmp")
+        tmp.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(target)
+
+    def load_snapshot(self, path: str | Path, max_age_sec: float) -> bool:
+        """Install a snapshot written by `save_snapshot`; keeps its original timestamp.
+
+        Snapshots older than `max_age_sec` or unreadable are ignored. A loaded
+        snapshot is usually stale, which makes the refresher replace it right away.
+        """
+        target = Path(path)
+        if not target.exists():
+            return False
+        try:
+            payload = json.loads(target.read_text(encoding="utf-8"))
+            saved_at = float(payload["saved_at"])
+            if now_ts() - saved_at > max_age_sec:
+                logger.info("Trend snapshot too old (%.0fs), ignoring it", now_ts() - saved_at)
+                return False
+            trends = [Trend.model_validate(item) for item in payload["trends"]]
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Trend snapshot unreadable, ignoring it: %s", exc)
+            return False
+        if not trends:
+            return False
+        self.replace(trends, int(payload.get("fetched_limit", len(trends))), updated_at=saved_at, origin="snapshot")
+        return True
+
+    def _prune(self, now: float) -> None:
+        while self._retained:
+            _, (_, seen_at) = next(iter(self._retained.items()))
+            if now - seen_at <= self.retention_sec and len(self._retained) <= self.retention_max:
+                break
+            self._retained.popitem(last=False)
+
+
+trend_store = TrendStore()
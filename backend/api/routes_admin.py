@@ -1,11 +1,19 @@
 ﻿from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException
+import asyncio
 
+from fastapi import APIRouter, HTTPException, Response
+
+from ..agent.jobs import job_queue, job_workers
 from ..agent.memory_engine import memory_engine
 from ..agent.orchestrator import orchestrator
+from ..agent.pipeline import pipeline_runner
+from ..agent.trend_store import trend_store
+from ..core.job_queue import FAILED
 from ..core.logger import get_logger
-from ..models.tweet import GenerateTweetsRequest
+from ..providers import router as llm_router
+from ..sources.pool import sources_http_pool
+from ..sources.validators import source_validators
 
 logger = get_logger(__name__)
 
@@ -13,38 +21,68 @@ router = APIRouter()
 
 
 @router.post("/pipeline")
-async def run_pipeline(num_trends: int = 5, tweets_per_trend: int = 9):
+async def run_pipeline(
+    response: Response,
+    num_trends: int = 5,
+    tweets_per_trend: int = 9,
+    batched: bool = True,
+    background: bool = True,
+):
+    params = {"num_trends": num_trends, "tweets_per_trend": tweets_per_trend, "batched": batched}
     try:
-        trends = await orchestrator.fetch_trends(limit=num_trends)
-        generated = []
-        for trend in trends:
-            request = GenerateTweetsRequest(
-                trend_id=trend.id,
-                theme=trend.theme,
-                style="insight",
-                count=tweets_per_trend,
-                include_remix=True,
-                draft_mode=False,
-            )
-            result = await orchestrator.generate(request)
-            generated.append(
-                {
-                    "trend_id": trend.id,
-                    "trend_title": trend.title,
-                    "top3": [tweet.model_dump() for tweet in result.top3],
-                }
-            )
-        return {"status": "ok", "trends": len(trends), "runs": generated}
+        if background:
+            job = await asyncio.to_thread(job_queue.enqueue, "pipeline", params, -1)
+            job_workers.notify()
+            response.status_code = 202
+            return {"job_id": job.id, "status": job.status}
+        return await pipeline_runner.run(**params)
     except Exception as exc:  # noqa: BLE001
         logger.exception("pipeline failed")
         raise HTTPException(status_code=500, detail=f"pipeline_failed: {exc}") from exc
 
 
+@router.get("/pipeline/jobs")
+async def list_pipeline_jobs(limit: int = 50):
+    jobs = await asyncio.to_thread(job_queue.list_jobs, "pipeline", limit)
+    return {"jobs": [job.to_dict(include_result=False) for job in jobs]}
+
+
+@router.get("/pipeline/{job_id}")
+async def get_pipeline_job(job_id: str):
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None or job.kind != "pipeline":
+        raise HTTPException(status_code=404, detail="pipeline_job_not_found")
+    return job.to_dict(include_result=False)
+
+
+@router.get("/pipeline/{job_id}/result")
+async def get_pipeline_result(job_id: str):
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None or job.kind != "pipeline":
+        raise HTTPException(status_code=404, detail="pipeline_job_not_found")
+    if job.result is None:
+        if job.status == FAILED:
+            raise HTTPException(status_code=500, detail=f"pipeline_failed: {job.error}")
+        raise HTTPException(status_code=409, detail=f"pipeline_job_{job.status}")
+    return {"job_id": job.id, **job.result}
+
+
 @router.get("/status")
 async def get_status():
     try:
         stats = memory_engine.get_stats()
-        return {"status": "ready", "memory": stats}
+        return {
+            "status": "ready",
+            "memory": stats,
+            "memory_persistence": memory_engine.persistence_stats(),
+            "llm": llm_router.status(),
+            "singleflight": orchestrator.flights.stats(),
+            "trends": trend_store.stats(),
+            "source_validators": source_validators.stats(),
+            "sources_http_pool": sources_http_pool.stats(),
+            "trend_refresher": orchestrator.refresher.stats(),
+            "jobs": await asyncio.to_thread(job_workers.stats),
+        }
     except Exception as exc:  # noqa: BLE001
         logger.exception("status failed")
         raise HTTPException(status_code=500, detail=f"status_failed: {exc}") from exc
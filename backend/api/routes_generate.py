@@ -1,11 +1,16 @@
 ﻿from __future__ import annotations
 
+import json
+from collections.abc import AsyncIterator
+
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 
 from ..agent.orchestrator import orchestrator
 from ..agent.scoring import scoring_engine
 from ..core.logger import get_logger
 from ..models.tweet import ABTestRequest, GenerateTweetsRequest, TweetCandidate
+from ..providers import GenerationQueueFull, GenerationQueueTimeout
 
 logger = get_logger(__name__)
 
@@ -16,11 +21,40 @@ router = APIRouter()
 async def generate_tweets(request: GenerateTweetsRequest):
     try:
         return (await orchestrator.generate(request)).model_dump()
+    except GenerationQueueFull as exc:
+        raise HTTPException(status_code=429, detail=f"generation_queue_full: {exc}", headers={"Retry-After": "5"}) from exc
+    except GenerationQueueTimeout as exc:
+        raise HTTPException(status_code=503, detail=f"generation_queue_timeout: {exc}") from exc
     except Exception as exc:  # noqa: BLE001
         logger.exception("generate_tweets failed")
         raise HTTPException(status_code=500, detail=f"generation_failed: {exc}") from exc
 
 
+def _sse(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@router.post("/stream")
+async def generate_tweets_stream(request: GenerateTweetsRequest):
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for event, payload in orchestrator.generate_stream(request):
+                yield _sse(event, payload)
+        except GenerationQueueFull as exc:
+            yield _sse("error", {"status_code": 429, "detail": f"generation_queue_full: {exc}"})
+        except GenerationQueueTimeout as exc:
+            yield _sse("error", {"status_code": 503, "detail": f"generation_queue_timeout: {exc}"})
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("generate_tweets_stream failed")
+            yield _sse("error", {"status_code": 500, "detail": f"generation_failed: {exc}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/score")
 async def score_tweets(tweets: list[TweetCandidate]):
     try:
@@ -40,6 +74,10 @@ async def run_ab_test(request: ABTestRequest):
     try:
         result = await orchestrator.run_ab_test(request)
         return result.model_dump()
+    except GenerationQueueFull as exc:
+        raise HTTPException(status_code=429, detail=f"generation_queue_full: {exc}", headers={"Retry-After": "5"}) from exc
+    except GenerationQueueTimeout as exc:
+        raise HTTPException(status_code=503, detail=f"generation_queue_timeout: {exc}") from exc
     except Exception as exc:  # noqa: BLE001
         logger.exception("ab test failed")
         raise HTTPException(status_code=500, detail=f"ab_test_failed: {exc}") from exc
@@ -0,0 +1,47 @@
+﻿from __future__ import annotations
+
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Query
+
+from ..agent.jobs import JOB_HANDLERS, job_queue, job_workers
+from ..core.logger import get_logger
+from ..models.job import JobSubmitRequest
+
+logger = get_logger(__name__)
+
+router = APIRouter()
+
+
+@router.post("/", status_code=202)
+async def submit_job(request: JobSubmitRequest):
+    if request.kind not in JOB_HANDLERS:
+        raise HTTPException(status_code=400, detail=f"unknown_job_kind: {request.kind}")
+    try:
+        job = await asyncio.to_thread(
+            job_queue.enqueue, request.kind, request.payload, request.priority, request.max_attempts
+        )
+        job_workers.notify()
+        return {"job_id": job.id, "status": job.status}
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("job submit failed")
+        raise HTTPException(status_code=500, detail=f"job_submit_failed: {exc}") from exc
+
+
+@router.get("/")
+async def list_jobs(kind: str | None = None, limit: int = Query(default=50, ge=1, le=500)):
+    try:
+        jobs = await asyncio.to_thread(job_queue.list_jobs, kind, limit)
+        stats = await asyncio.to_thread(job_workers.stats)
+        return {"items": [job.to_dict(include_result=False) for job in jobs], "stats": stats}
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("job list failed")
+        raise HTTPException(status_code=500, detail=f"job_list_failed: {exc}") from exc
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job_not_found")
+    return job.to_dict()
@@ -3,6 +3,7 @@
 from fastapi import APIRouter, HTTPException, Query
 
 from ..agent.orchestrator import orchestrator
+from ..agent.trend_store import trend_store
 from ..core.logger import get_logger
 from ..core.utils import now_ts
 
@@ -18,7 +19,9 @@ async def fetch_trends(limit: int = Query(default=20, ge=1, le=100), force_refre
         return {
             "trends": [trend.model_dump() for trend in trends],
             "count": len(trends),
-            "fetched_at": now_ts(),
+            "fetched_at": trend_store.updated_at or now_ts(),
+            "age_sec": round(now_ts() - trend_store.updated_at, 1) if trend_store.updated_at else None,
+            "stale": not trend_store.is_fresh(),
         }
     except Exception as exc:  # noqa: BLE001
         logger.exception("fetch_trends failed")
@@ -10,6 +10,8 @@ from backend.models.tweet import GenerateTweetsRequest
 from backend.providers.ollama import OllamaClient
 from backend.providers.openai import OpenAIClient
 from backend.providers.groq import GroqClient
+from backend.providers.pool import llm_http_pool
+from backend.sources import pool as sources_pool
 
 
 def _write_json(path: Path, payload: dict) -> None:
@@ -27,6 +29,7 @@ async def doctor() -> int:
 
     ollama = OllamaClient()
     ok_ollama = await ollama.healthcheck(timeout=3.0)
+    await llm_http_pool.aclose()
     print(f"Ollama: {'OK' if ok_ollama else 'NOT READY'}")
     ok_any = ok_any or ok_ollama
 
@@ -80,6 +83,9 @@ async def run_once(args: argparse.Namespace) -> int:
         print("")
         print("Tip: run `python -m backend.cli doctor` and ensure at least one provider is OK.")
         return 3
+    finally:
+        await llm_http_pool.aclose()
+        await sources_pool.aclose()
 
     providers = sorted(set(t.provider_used for t in response.all_candidates))
 
@@ -112,6 +118,95 @@ async def run_once(args: argparse.Namespace) -> int:
     return 0
 
 
+async def worker(args: argparse.Namespace) -> int:
+    from backend.agent.jobs import job_queue, job_workers
+
+    concurrency = args.concurrency or max(1, SETTINGS.jobs.in_process_workers)
+    print(f"== Job worker ({concurrency} tasks, queue={SETTINGS.jobs.db_path}) ==")
+    job_queue.prune()
+    try:
+        await job_workers.run_forever(concurrency)
+    finally:
+        job_queue.close()
+        await llm_http_pool.aclose()
+        await sources_pool.aclose()
+    return 0
+
+
+def migrate_memory(args: argparse.Namespace) -> int:
+    from backend.agent.memory_engine import MemoryEngine
+    from backend.agent.memory_store import build_memory_store
+
+    if args.source == args.target:
+        print("Source and target backends are the same.")
+        return 2
+
+    source = build_memory_store(args.source, args.source_path or None)
+    if source.load() is None:
+        print(f"Nothing to migrate: {args.source} memory is empty.")
+        return 2
+
+    data = MemoryEngine(store=source).export_json()
+    target = build_memory_store(args.target, args.target_path or None)
+    target.replace(data)
+    source.close()
+    target.close()
+
+    print(f"Migrated memory {args.source} -> {args.target}")
+    for key in ("tweets", "history", "favorites", "ab_tests"):
+        print(f"- {key}: {len(data[key])}")
+    print(f"Set memory.backend: {args.target} in settings.yaml to use it.")
+    return 0
+
+
+def bench_dedupe(args: argparse.Namespace) -> int:
+    import random
+    import time
+
+    from backend.agent.trend_analyzer import TrendAnalyzer
+    from backend.models.trend import Trend
+
+    rng = random.Random(args.seed)
+    vocab = [f"w{index}" for index in range(5000)]
+    originals = [rng.sample(vocab, rng.randint(8, 14)) for _ in range(args.items)]
+    titles: list[tuple[int, list[str]]] = [(index, title) for index, title in enumerate(originals)]
+    for _ in range(int(args.items * args.dup_rate)):
+        source = rng.randrange(args.items)
+        variant = list(originals[source])
+        # One word swapped: Jaccard stays around 0.8 for these title lengths.
+        variant[rng.randrange(len(variant))] = rng.choice(vocab)
+        titles.append((source, variant))
+    rng.shuffle(titles)
+
+    trends = [
+        Trend(
+            id=f"bench-{index}",
+            title=" ".join(tokens),
+            source="bench",
+            source_url=f"https://example.com/{index}",
+            created_at=0.0,
+        )
+        for index, (_, tokens) in enumerate(titles)
+    ]
+    origin = {trend.id: source for trend, (source, _) in zip(trends, titles)}
+    analyzer = TrendAnalyzer()
+
+    started = time.perf_counter()
+    pairwise = analyzer._dedupe_pairwise([trend.model_copy() for trend in trends])
+    pairwise_sec = time.perf_counter() - started
+
+    started = time.perf_counter()
+    lsh = analyzer._merge_stories([trend.model_copy() for trend in trends])
+    lsh_sec = time.perf_counter() - started
+
+    print(f"== Dedupe benchmark: {len(trends)} titles ({args.items} stories) ==")
+    for name, kept, seconds in (("pairwise", pairwise, pairwise_sec), ("lsh", lsh, lsh_sec)):
+        stories = len({origin[trend.id] for trend in kept})
+        print(f"{name:>9}: {seconds:8.3f}s  kept={len(kept):6d}  distinct stories kept={stories}")
+    print(f"  speedup: x{pairwise_sec / max(lsh_sec, 1e-9):.1f}")
+    return 0
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(prog="editorial-agent")
     sub = parser.add_subparsers(dest="cmd", required=True)
@@ -127,6 +222,20 @@ def main() -> int:
     run.add_argument("--draft", action="store_true")
     run.add_argument("--out", type=str, default="backend/data/latest_run.json")
 
+    work = sub.add_parser("worker", help="Process queued generation jobs")
+    work.add_argument("--concurrency", type=int, default=0)
+
+    bench = sub.add_parser("bench-dedupe", help="Compare pairwise and LSH trend dedupe")
+    bench.add_argument("--items", type=int, default=2000)
+    bench.add_argument("--dup-rate", type=float, default=0.3)
+    bench.add_argument("--seed", type=int, default=7)
+
+    migrate = sub.add_parser("migrate-memory", help="Copy memory between storage backends")
+    migrate.add_argument("--from", dest="source", choices=["json", "sqlite"], default="json")
+    migrate.add_argument("--to", dest="target", choices=["json", "sqlite"], default="sqlite")
+    migrate.add_argument("--source-path", type=str, default="")
+    migrate.add_argument("--target-path", type=str, default="")
+
     args = parser.parse_args()
 
     import asyncio
@@ -137,6 +246,18 @@ def main() -> int:
     if args.cmd == "run":
         return asyncio.run(run_once(args))
 
+    if args.cmd == "bench-dedupe":
+        return bench_dedupe(args)
+
+    if args.cmd == "migrate-memory":
+        return migrate_memory(args)
+
+    if args.cmd == "worker":
+        try:
+            return asyncio.run(worker(args))
+        except KeyboardInterrupt:
+            return 0
+
     return 1
 
 
@@ -41,6 +41,34 @@ class LLMRuntimeConfig:
     # Local Ollama can be slow; keep this generous and override via LLM_TIMEOUT_SEC.
     request_timeout_sec: float = 180.0
     max_retries: int = 0
+    # Default completion budget (Ollama num_predict); batched prompts ask for more.
+    max_output_tokens: int = 700
+    # Shared HTTP pool reused by every provider call (keep-alive, HTTP/2 if h2 is installed).
+    pool_max_connections: int = 20
+    pool_max_keepalive: int = 10
+    pool_keepalive_expiry_sec: float = 60.0
+    http2: bool = True
+    # Provider health cache + circuit breaker (checked instead of a healthcheck per request).
+    health_ttl_sec: float = 30.0
+    health_probe_interval_sec: float = 15.0
+    health_probe_timeout_sec: float = 3.0
+    breaker_failure_threshold: int = 3
+    breaker_reset_sec: float = 30.0
+    # Rolling latency window per provider/model (feeds hedging).
+    latency_window: int = 200
+    latency_min_samples: int = 10
+    # Hedged requests: race the next provider when the primary is slower than its usual percentile.
+    hedge_enabled: bool = False
+    hedge_percentile: float = 0.95
+    hedge_min_delay_sec: float = 2.0
+    hedge_default_delay_sec: float = 20.0
+    # Adaptive read timeout: p(timeout_percentile) x timeout_factor, clamped to
+    # [timeout_min_sec, request_timeout_sec]; request_timeout_sec until enough samples.
+    adaptive_timeouts: bool = True
+    timeout_percentile: float = 0.99
+    timeout_factor: float = 3.0
+    timeout_min_sec: float = 15.0
+    connect_timeout_sec: float = 5.0
 
 
 @dataclass
@@ -78,11 +106,61 @@ class SourcesConfig:
     enable_twitter_trends: bool = False
     enable_youtube_trends: bool = False
     max_trends_per_source: int = 20
+    # Near-duplicate detection (MinHash/LSH): word shingles, bands x rows permutations.
+    dedupe_threshold: float = 0.75
+    dedupe_summary_threshold: float = 0.6
+    dedupe_use_summary: bool = True
+    dedupe_shingle_size: int = 1
+    dedupe_bands: int = 16
+    dedupe_rows: int = 4
+    # Story momentum = best member momentum + boosts for extra outlets, recency and Reddit upvotes.
+    story_source_boost: float = 0.15
+    story_max_extra_sources: int = 4
+    story_recency_weight: float = 0.3
+    story_recency_half_life_hours: float = 12.0
+    story_engagement_weight: float = 0.3
+    # Trend store: every refresh ranks at least this many trends, callers slice their limit.
+    trend_pool_size: int = 80
+    # Trends that left the current set stay resolvable by id for this long.
+    trend_retention_sec: float = 21600.0
+    trend_retention_max: int = 2000
+    # Background refresh, ahead of the cache TTL; requests serve the last good set meanwhile.
+    trend_refresh_enabled: bool = True
+    trend_refresh_interval_sec: float = 240.0
+    trend_refresh_retry_sec: float = 30.0
+    # Last good trend set on disk, loaded at startup so the API is ready before any fetch.
+    trend_snapshot_path: str = "backend/data/trends_snapshot.json"
+    trend_snapshot_max_age_sec: float = 86400.0
+    # Conditional requests (ETag / Last-Modified / body hash); unchanged feeds reuse their parsed trends.
+    conditional_fetch: bool = True
+    validators_path: str = "backend/data/http_validators.json"
+    # Shared keep-alive pool for every source download; parsing runs on `parse_workers` threads.
+    http_user_agent: str = "editorial-agent/1.0"
+    http_max_connections: int = 20
+    http_max_keepalive: int = 10
+    http_keepalive_expiry_sec: float = 60.0
+    feed_timeout_sec: float = 8.0
+    feed_connect_timeout_sec: float = 3.0
+    parse_workers: int = 4
 
 
 @dataclass
 class MemoryConfig:
+    # "json" (single file, rewritten on each change) or "sqlite" (WAL, row-level writes).
+    backend: str = "json"
     path: str = "backend/data/memory.json"
+    sqlite_path: str = "backend/data/memory.sqlite3"
+    # json backend: append mutations to memory.journal, rewrite memory.json only on compaction.
+    journal_enabled: bool = True
+    journal_fsync: str = "interval"  # always | interval | never
+    journal_fsync_interval_sec: float = 1.0
+    journal_compact_every: int = 200
+    journal_compact_interval_sec: float = 600.0
+    # "sync" persists inside each mutation; "write_behind" queues ops and a background
+    # task flushes them (loses at most flush_interval_sec of changes on a hard crash).
+    durability: str = "sync"
+    flush_interval_sec: float = 2.0
+    flush_dirty_threshold: int = 50
     max_tweets: int = 2000
     max_history: int = 500
 
@@ -92,6 +170,12 @@ class CacheConfig:
     enabled: bool = True
     ttl_seconds: int = 300
     max_size: int = 1024
+    # Opt-in LLM response cache: identical prompts reuse the previous completion.
+    llm_enabled: bool = False
+    llm_ttl_seconds: int = 3600
+    llm_memory_entries: int = 256
+    llm_disk_entries: int = 2000
+    llm_disk_path: str = "backend/data/llm_cache"
 
 
 @dataclass
@@ -101,6 +185,30 @@ class GenerationConfig:
     supported_languages: list[str] = field(default_factory=lambda: ["en", "fr", "es", "de"])
     candidates_per_request: int = 9
     max_parallel_generations: int = 1
+    # Per-provider override of max_parallel_generations, e.g. {"openai": 8}.
+    provider_concurrency: dict[str, int] = field(default_factory=dict)
+    max_queue_depth: int = 16
+    queue_timeout_sec: float = 120.0
+    # Batched prompts (several trends per LLM call); tokens are estimated as chars / 4.
+    batch_token_budget: int = 4000
+    batch_max_trends: int = 5
+    batch_tokens_per_tweet: int = 70
+    # /admin/pipeline: trends (or trend batches) generated at once, deadline per unit.
+    pipeline_concurrency: int = 3
+    pipeline_trend_timeout_sec: float = 240.0
+
+
+@dataclass
+class JobsConfig:
+    db_path: str = "backend/data/jobs.sqlite3"
+    # Worker tasks started inside the API process; 0 leaves the work to `backend.cli worker`.
+    in_process_workers: int = 2
+    poll_interval_sec: float = 0.5
+    max_attempts: int = 3
+    retry_backoff_sec: float = 5.0
+    # A running job whose worker disappeared is requeued after this long.
+    lease_sec: float = 900.0
+    retention_sec: float = 86400.0
 
 
 @dataclass
@@ -115,6 +223,7 @@ class Settings:
     memory: MemoryConfig = field(default_factory=MemoryConfig)
     cache: CacheConfig = field(default_factory=CacheConfig)
     generation: GenerationConfig = field(default_factory=GenerationConfig)
+    jobs: JobsConfig = field(default_factory=JobsConfig)
 
 
 
@@ -158,6 +267,7 @@ def load_settings() -> Settings:
         _merge_dataclass(settings.memory, raw.get("memory", {}))
         _merge_dataclass(settings.cache, raw.get("cache", {}))
         _merge_dataclass(settings.generation, raw.get("generation", {}))
+        _merge_dataclass(settings.jobs, raw.get("jobs", {}))
 
     _apply_env_overrides(settings)
     return settings
@@ -0,0 +1,78 @@
+﻿from __future__ import annotations
+
+import asyncio
+import importlib.util
+from typing import Any
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class HTTPPool:
+    """Shared keep-alive `httpx.AsyncClient`, built lazily on the running loop."""
+
+    def __init__(
+        self,
+        name: str,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 60.0,
+        http2: bool = True,
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        self.name = name
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        self.headers = headers or {}
+        self._client: Any = None
+        self._http2_active = False
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def client(self) -> Any:
+        try:
+            import httpx
+        except Exception as exc:  # noqa: BLE001
+            raise RuntimeError("httpx package missing") from exc
+
+        loop = asyncio.get_running_loop()
+        if self._client is not None and not self._client.is_closed and self._loop is loop:
+            return self._client
+
+        # A client is bound to the loop that created it (CLI runs one loop per command).
+        http2 = self.http2 and importlib.util.find_spec("h2") is not None
+        if self.http2 and not http2:
+            logger.info("HTTP pool %s: h2 not installed, using HTTP/1.1 keep-alive", self.name)
+
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            headers=self.headers,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+        )
+        self._http2_active = http2
+        self._loop = loop
+        return self._client
+
+    async def aclose(self) -> None:
+        client, self._client = self._client, None
+        if client is None or client.is_closed:
+            return
+        try:
+            await client.aclose()
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("HTTP pool %s close failed: %s", self.name, exc)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "open": self._client is not None and not self._client.is_closed,
+            "http2": self._http2_active,
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+        }
@@ -0,0 +1,380 @@
+﻿from __future__ import annotations
+
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import uuid
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from .config import SETTINGS
+from .logger import get_logger
+from .utils import now_ts
+
+logger = get_logger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+JobHandler = Callable[[dict[str, Any]], Awaitable[dict[str, Any]]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_after REAL NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    worker TEXT,
+    result TEXT,
+    error TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (status, priority DESC, run_after, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs (finished_at);
+"""
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    payload: dict[str, Any]
+    priority: int
+    status: str
+    attempts: int
+    max_attempts: int
+    run_after: float
+    created_at: float
+    started_at: float | None = None
+    finished_at: float | None = None
+    worker: str | None = None
+    result: dict[str, Any] | None = None
+    error: str = ""
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> Job:
+        data = dict(row)
+        data["payload"] = json.loads(data["payload"])
+        data["result"] = json.loads(data["result"]) if data["result"] else None
+        return cls(**data)
+
+    def to_dict(self, include_result: bool = True) -> dict[str, Any]:
+        data = asdict(self)
+        if not include_result:
+            data.pop("result")
+        return data
+
+
+class JobQueue:
+    """SQLite-backed job queue shared by the API process and `backend.cli worker`.
+
+    Jobs are claimed highest priority first, then oldest first. A failed job is retried
+    with exponential backoff until `max_attempts`; a running job whose lease expired
+    (worker crashed or was killed) goes back to the queue, or fails if that was its
+    last attempt. Workers renew the lease with `heartbeat` (bumping `started_at`), and
+    results are only recorded by the worker that still owns the job.
+    """
+
+    def __init__(
+        self,
+        path: str = SETTINGS.jobs.db_path,
+        max_attempts: int = SETTINGS.jobs.max_attempts,
+        retry_backoff_sec: float = SETTINGS.jobs.retry_backoff_sec,
+        lease_sec: float = SETTINGS.jobs.lease_sec,
+        retention_sec: float = SETTINGS.jobs.retention_sec,
+    ) -> None:
+        self.path = Path(path)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_backoff_sec = retry_backoff_sec
+        self.lease_sec = lease_sec
+        self.retention_sec = retention_sec
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: dict[str, Any],
+        priority: int = 0,
+        max_attempts: int | None = None,
+    ) -> Job:
+        now = now_ts()
+        job = Job(
+            id=f"job-{uuid.uuid4().hex[:16]}",
+            kind=kind,
+            payload=payload,
+            priority=priority,
+            status=QUEUED,
+            attempts=0,
+            max_attempts=max(1, max_attempts or self.max_attempts),
+            run_after=now,
+            created_at=now,
+        )
+        with self._lock:
+            self._connect().execute(
+                "INSERT INTO jobs (id, kind, payload, priority, status, attempts, max_attempts, run_after, created_at)"
+                " VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?)",
+                (job.id, kind, json.dumps(payload, ensure_ascii=False), priority, QUEUED, job.max_attempts, now, now),
+            )
+        return job
+
+    def claim(self, worker: str, kinds: list[str] | None = None) -> Job | None:
+        now = now_ts()
+        kind_filter = ""
+        params: list[Any] = [QUEUED, now]
+        if kinds:
+            kind_filter = f" AND kind IN ({', '.join('?' for _ in kinds)})"
+            params.extend(kinds)
+        with self._lock:
+            conn = self._connect()
+            # IMMEDIATE takes the write lock up front so two processes never claim the same row.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Expired leases: requeue, unless the job already used its attempts (a job
+                # that keeps killing or hanging its worker must not be retried forever).
+                expired = now - self.lease_sec
+                conn.execute(
+                    "UPDATE jobs SET status = ?, finished_at = ?, error = ?"
+                    " WHERE status = ? AND started_at < ? AND attempts >= max_attempts",
+                    (FAILED, now, "lease expired on the last attempt", RUNNING, expired),
+                )
+                conn.execute(
+                    "UPDATE jobs SET status = ?, run_after = ?, worker = NULL WHERE status = ? AND started_at < ?",
+                    (QUEUED, now, RUNNING, expired),
+                )
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE status = ? AND run_after <= ?"
+                    f"{kind_filter} ORDER BY priority DESC, run_after, created_at LIMIT 1",
+                    params,
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, worker = ? WHERE id = ?",
+                    (RUNNING, now, worker, row["id"]),
+                )
+                claimed = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return Job.from_row(claimed)
+
+    def heartbeat(self, job: Job) -> bool:
+        """Extend the lease of a running job; False once another worker took it over."""
+        with self._lock:
+            cursor = self._connect().execute(
+                "UPDATE jobs SET started_at = ? WHERE id = ? AND worker = ? AND status = ?",
+                (now_ts(), job.id, job.worker, RUNNING),
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job: Job, result: dict[str, Any]) -> bool:
+        """Record the result; False (and nothing written) if `job` no longer owns the row."""
+        with self._lock:
+            cursor = self._connect().execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ''"
+                " WHERE id = ? AND worker = ? AND status = ?",
+                (DONE, now_ts(), json.dumps(result, ensure_ascii=False), job.id, job.worker, RUNNING),
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, job: Job, error: str, retryable: bool = True) -> str | None:
+        """Record a failed attempt; returns the new status, or None if the job was lost."""
+        now = now_ts()
+        error = error[:500]
+        owned = " WHERE id = ? AND worker = ? AND status = ?"
+        with self._lock:
+            conn = self._connect()
+            if retryable and job.attempts < job.max_attempts:
+                delay = self.retry_backoff_sec * 2 ** (job.attempts - 1)
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = ?, run_after = ?, worker = NULL, error = ?" + owned,
+                    (QUEUED, now + delay, error, job.id, job.worker, RUNNING),
+                )
+                status = QUEUED
+            else:
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = ?, finished_at = ?, error = ?" + owned,
+                    (FAILED, now, error, job.id, job.worker, RUNNING),
+                )
+                status = FAILED
+        return status if cursor.rowcount == 1 else None
+
+    def release(self, job: Job) -> None:
+        """Put a claimed job back without counting the attempt (worker shutdown)."""
+        with self._lock:
+            self._connect().execute(
+                "UPDATE jobs SET status = ?, attempts = MAX(attempts - 1, 0), run_after = ?, worker = NULL"
+                " WHERE id = ? AND worker = ? AND status = ?",
+                (QUEUED, now_ts(), job.id, job.worker, RUNNING),
+            )
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row else None
+
+    def list_jobs(self, kind: str | None = None, limit: int = 50) -> list[Job]:
+        query = "SELECT * FROM jobs"
+        params: list[Any] = []
+        if kind:
+            query += " WHERE kind = ?"
+            params.append(kind)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._connect().execute(query, params).fetchall()
+        return [Job.from_row(row) for row in rows]
+
+    def prune(self) -> int:
+        with self._lock:
+            cursor = self._connect().execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (DONE, FAILED, now_ts() - self.retention_sec),
+            )
+        return cursor.rowcount
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            rows = self._connect().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class JobWorkers:
+    """Async worker tasks polling a `JobQueue` and dispatching jobs to handlers by kind."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handlers: dict[str, JobHandler],
+        poll_interval_sec: float = SETTINGS.jobs.poll_interval_sec,
+    ) -> None:
+        self.queue = queue
+        self.handlers = handlers
+        self.poll_interval_sec = poll_interval_sec
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self.processed = 0
+        self.failures = 0
+
+    def notify(self) -> None:
+        """Wake idle workers right away after an enqueue in this process."""
+        self._wakeup.set()
+
+    def start(self, count: int) -> None:
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._loop(f"{self.worker_id}/{index}")) for index in range(count)]
+        if self._tasks:
+            logger.info("Started %s job workers (%s)", len(self._tasks), ", ".join(sorted(self.handlers)))
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run_forever(self, count: int) -> None:
+        self.start(count)
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            await self.stop()
+
+    async def _loop(self, name: str) -> None:
+        kinds = sorted(self.handlers)
+        while True:
+            try:
+                job = await asyncio.to_thread(self.queue.claim, name, kinds)
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("job claim failed: %s", exc)
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval_sec)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _heartbeat(self, job: Job) -> None:
+        interval = max(1.0, self.queue.lease_sec / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                owned = await asyncio.to_thread(self.queue.heartbeat, job)
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("job %s heartbeat failed: %s", job.id, exc)
+                continue
+            if not owned:
+                logger.warning("job %s lease lost, its result will be discarded", job.id)
+                return
+
+    async def _run(self, job: Job) -> None:
+        handler = self.handlers[job.kind]
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            result = await handler(job.payload)
+        except asyncio.CancelledError:
+            # Shutdown mid-job: hand it back instead of burning an attempt.
+            await asyncio.to_thread(self.queue.release, job)
+            raise
+        except Exception as exc:  # noqa: BLE001
+            self.failures += 1
+            status = await asyncio.to_thread(
+                self.queue.fail, job, repr(exc), not isinstance(exc, (ValueError, TypeError))
+            )
+            logger.warning("job %s (%s) attempt %s failed -> %s: %r", job.id, job.kind, job.attempts, status, exc)
+            return
+        finally:
+            heartbeat.cancel()
+        if await asyncio.to_thread(self.queue.complete, job, result):
+            self.processed += 1
+        else:
+            logger.warning("job %s finished after losing its lease, result discarded", job.id)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "workers": len(self._tasks),
+            "kinds": sorted(self.handlers),
+            "processed": self.processed,
+            "failures": self.failures,
+            "queue": self.queue.stats(),
+        }
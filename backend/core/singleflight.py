@@ -0,0 +1,58 @@
+﻿from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesce concurrent calls sharing a key into one in-flight task.
+
+    The first caller starts the work; callers arriving before it completes await
+    the same task and receive the same result (or exception). The task is shielded
+    so a cancelled waiter never cancels the work for the others; when the last
+    waiter is cancelled (e.g. a deadline) the work is cancelled too, and that
+    waiter returns only once it has unwound.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._waiters: dict[asyncio.Task, int] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters.get(task) == 1 and not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+            raise
+        finally:
+            remaining = self._waiters.get(task, 1) - 1
+            if remaining > 0:
+                self._waiters[task] = remaining
+            else:
+                self._waiters.pop(task, None)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            self._inflight.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every waiter was cancelled.
+            task.exception()
+
+    def stats(self) -> dict[str, Any]:
+        return {"inflight": len(self._inflight), "started": self.started, "coalesced": self.coalesced}
@@ -1,12 +1,14 @@
 ﻿from __future__ import annotations
 
 import asyncio
+import calendar
 import hashlib
 import json
 import random
 import re
 import time
 from collections.abc import Awaitable, Callable
+from datetime import datetime, timezone
 from typing import Any, TypeVar
 
 T = TypeVar("T")
@@ -67,6 +69,55 @@ def parse_json_loose(text: str) -> Any | None:
 
 
 
+class JSONObjectStream:
+    """Extract JSON objects from streamed text as soon as each one closes.
+
+    Brace depth is tracked outside string literals only, so `{`/`}` inside tweet
+    texts are ignored. Inner objects are emitted before the object containing them.
+    """
+
+    def __init__(self) -> None:
+        self._text = ""
+        self._pos = 0
+        self._starts: list[int] = []
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> list[dict[str, Any]]:
+        self._text += chunk
+        text = self._text
+        found: list[dict[str, Any]] = []
+        for index in range(self._pos, len(text)):
+            char = text[index]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._starts.append(index)
+            elif char == "}" and self._starts:
+                start = self._starts.pop()
+                try:
+                    obj = json.loads(text[start : index + 1])
+                except Exception:  # noqa: BLE001
+                    continue
+                if isinstance(obj, dict):
+                    found.append(obj)
+        self._pos = len(text)
+        return found
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+
+
 def normalize_text(text: str) -> str:
     cleaned = " ".join(text.split())
     return "".join(ch for ch in cleaned if ch.isprintable())
@@ -92,14 +143,45 @@ def short_hash(text: str) -> str:
 
 
 
-def jaccard_similarity(a: str, b: str) -> float:
-    tokens_a = set(re.findall(r"\w+", a.lower()))
-    tokens_b = set(re.findall(r"\w+", b.lower()))
+_WORD_RE = re.compile(r"\w+")
+
+
+def words(text: str) -> list[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def tokenize(text: str) -> frozenset[str]:
+    return frozenset(words(text))
+
+
+def jaccard_tokens(tokens_a: frozenset[str] | set[str], tokens_b: frozenset[str] | set[str]) -> float:
     if not tokens_a or not tokens_b:
         return 0.0
-    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+    inter = len(tokens_a & tokens_b)
+    return inter / (len(tokens_a) + len(tokens_b) - inter)
+
+
+def jaccard_similarity(a: str, b: str) -> float:
+    return jaccard_tokens(tokenize(a), tokenize(b))
 
 
 
 def now_ts() -> float:
     return time.time()
+
+
+def timestamp_from(value: Any) -> float | None:
+    """Epoch seconds from a feed `struct_time`, an ISO-8601 string or a number; None if unknown."""
+    if value is None or value == "":
+        return None
+    try:
+        if isinstance(value, (int, float)):
+            return float(value)
+        if isinstance(value, time.struct_time):
+            return float(calendar.timegm(value))
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    except (TypeError, ValueError, OverflowError):
+        return None
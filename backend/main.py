@@ -24,16 +24,22 @@ if __package__ in (None, ""):
     if str(repo_root) not in sys.path:
         sys.path.insert(0, str(repo_root))
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
+from backend.agent.jobs import job_queue, job_workers
+from backend.agent.memory_engine import memory_engine
 from backend.agent.orchestrator import orchestrator
+from backend.agent.trend_store import trend_store
 from backend.api.routes_admin import router as admin_router
 from backend.api.routes_generate import router as generate_router
+from backend.api.routes_jobs import router as jobs_router
 from backend.api.routes_memory import router as memory_router
 from backend.api.routes_trends import router as trends_router
 from backend.core.config import SETTINGS
 from backend.core.logger import get_logger
+from backend.providers import router as llm_router
+from backend.sources import pool as sources_pool
 
 logger = get_logger(__name__)
 
@@ -41,9 +47,21 @@ logger = get_logger(__name__)
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     logger.info("Starting Editorial Agent v%s", SETTINGS.app.version)
-    await orchestrator.fetch_trends(limit=20, force_refresh=True)
+    llm_router.start()
+    memory_engine.start()
+    # Never wait on the feeds here: serve the snapshot, refresh in the background.
+    orchestrator.start_trends()
+    job_queue.prune()
+    job_workers.start(SETTINGS.jobs.in_process_workers)
     yield
     logger.info("Stopping Editorial Agent")
+    await orchestrator.stop_trends()
+    await job_workers.stop()
+    job_queue.close()
+    await memory_engine.stop()
+    memory_engine.close()
+    await llm_router.aclose()
+    await sources_pool.aclose()
 
 
 app = FastAPI(
@@ -66,6 +84,7 @@ app.include_router(generate_router, prefix=f"{base}/generate", tags=["generate"]
 app.include_router(trends_router, prefix=f"{base}/trends", tags=["trends"])
 app.include_router(memory_router, prefix=f"{base}/memory", tags=["memory"])
 app.include_router(admin_router, prefix=f"{base}/admin", tags=["admin"])
+app.include_router(jobs_router, prefix=f"{base}/jobs", tags=["jobs"])
 
 
 @app.get("/")
@@ -81,3 +100,17 @@ async def root():
 @app.get("/health")
 async def health():
     return {"status": "ok", "service": SETTINGS.app.app_name}
+
+
+@app.get("/ready")
+async def ready(response: Response):
+    """Readiness (vs liveness on /health): 503 until trends can be served."""
+    trends = trend_store.stats()
+    state = orchestrator.trends_state()
+    if state != "ready":
+        response.status_code = 503
+    return {
+        "status": state,
+        "trends": {"count": trends["size"], "origin": trends["origin"], "age_sec": trends["age_sec"]},
+        "trend_refresher": orchestrator.refresher.stats(),
+    }
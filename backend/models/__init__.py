@@ -1,7 +1,9 @@
-﻿from .trend import Trend, TrendAnalyzeResponse, TrendFetchResponse
+﻿from .job import JobSubmitRequest
+from .trend import Trend, TrendAnalyzeResponse, TrendFetchResponse, TrendMember
 from .tweet import (
     ABTestRequest,
     ABTestResult,
+    ABVariantResult,
     FavoriteTweetRequest,
     GenerateTweetsRequest,
     GenerateTweetsResponse,
@@ -12,6 +14,7 @@ from .tweet import (
 
 __all__ = [
     "Trend",
+    "TrendMember",
     "TrendFetchResponse",
     "TrendAnalyzeResponse",
     "ScoreBreakdown",
@@ -21,5 +24,7 @@ __all__ = [
     "GenerateTweetsResponse",
     "ABTestRequest",
     "ABTestResult",
+    "ABVariantResult",
     "FavoriteTweetRequest",
+    "JobSubmitRequest",
 ]
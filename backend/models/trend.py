@@ -5,6 +5,14 @@ from pydantic import BaseModel, Field, field_validator
 from ..core.utils import normalize_text
 
 
+class TrendMember(BaseModel):
+    id: str
+    title: str
+    source: str
+    source_url: str = ""
+    published_at: float | None = None
+
+
 class Trend(BaseModel):
     id: str
     title: str = Field(min_length=4, max_length=240)
@@ -16,6 +24,13 @@ class Trend(BaseModel):
     momentum: float = 0.0
     viral_angle: str = "standard"
     tags: list[str] = Field(default_factory=list)
+    # Source URLs of near-duplicates merged into this trend by the dedupe stage.
+    related_urls: list[str] = Field(default_factory=list)
+    # Story clustering: outlets covering it, the merged headlines, Reddit upvotes.
+    sources: list[str] = Field(default_factory=list)
+    members: list[TrendMember] = Field(default_factory=list)
+    engagement: float = 0.0
+    published_at: float | None = None
     created_at: float
 
     @field_validator("title", "summary")
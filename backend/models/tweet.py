@@ -72,6 +72,7 @@ class GenerateTweetsRequest(BaseModel):
     count: int = Field(default=9, ge=3, le=30)
     include_remix: bool = True
     draft_mode: bool = False
+    bypass_cache: bool = False
 
 
 class GenerateTweetsResponse(BaseModel):
@@ -86,7 +87,30 @@ class ABTestRequest(BaseModel):
     trend_text: str
     variant_a_style: str = "insight"
     variant_b_style: str = "ironique"
+    # A/B/n: when set, replaces variant_a_style / variant_b_style (labelled A, B, C...).
+    variants: list[str] = Field(default_factory=list, max_length=6)
     samples: int = Field(default=6, ge=2, le=20)
+    trials: int = Field(default=1, ge=1, le=10)
+
+    @field_validator("variants")
+    @classmethod
+    def _enough_variants(cls, value: list[str]) -> list[str]:
+        if len(value) == 1:
+            raise ValueError("variants needs at least 2 styles")
+        return value
+
+    def styles(self) -> list[str]:
+        # Repeated styles stay separate variants (an A/A run is a valid noise check).
+        return list(self.variants or [self.variant_a_style, self.variant_b_style])
+
+
+class ABVariantResult(BaseModel):
+    label: str
+    style: str
+    avg_score: float
+    trial_scores: list[float]
+    stdev: float = 0.0
+    top: list[TweetCandidate]
 
 
 class ABTestResult(BaseModel):
@@ -95,6 +119,11 @@ class ABTestResult(BaseModel):
     variant_b_avg_score: float
     variant_a_top: list[TweetCandidate]
     variant_b_top: list[TweetCandidate]
+    variants: list[ABVariantResult] = Field(default_factory=list)
+    trials: int = 1
+    # Winner lead over the runner-up in standard errors; None with a single trial.
+    z_score: float | None = None
+    confident: bool | None = None
 
 
 class FavoriteTweetRequest(BaseModel):
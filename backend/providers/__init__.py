@@ -1,3 +1,4 @@
-﻿from .router import LLMResult, router
+﻿from .limiter import GenerationQueueFull, GenerationQueueTimeout
+from .router import LLMResult, router
 
-__all__ = ["LLMResult", "router"]
+__all__ = ["GenerationQueueFull", "GenerationQueueTimeout", "LLMResult", "router"]
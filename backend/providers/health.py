@@ -0,0 +1,179 @@
+﻿from __future__ import annotations
+
+import asyncio
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from ..core.config import SETTINGS
+from ..core.logger import get_logger
+from ..core.utils import now_ts
+
+logger = get_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+@dataclass
+class ProviderHealth:
+    name: str
+    healthy: bool | None = None
+    checked_at: float = 0.0
+    state: str = CLOSED
+    consecutive_failures: int = 0
+    opened_at: float = 0.0
+    trial_inflight: bool = False
+    trial_started_at: float = 0.0
+    last_error: str = ""
+
+
+class HealthRegistry:
+    """Cached provider health with a per-provider circuit breaker.
+
+    Health results are reused for `ttl_sec`; after `failure_threshold` consecutive
+    failures the breaker opens and the provider is skipped for `reset_sec`, then a
+    single trial request is let through (half-open) to decide whether to close it.
+    A trial that never reports back expires after `trial_timeout_sec`.
+    """
+
+    def __init__(
+        self,
+        clients: dict[str, Any],
+        ttl_sec: float = SETTINGS.llm.health_ttl_sec,
+        failure_threshold: int = SETTINGS.llm.breaker_failure_threshold,
+        reset_sec: float = SETTINGS.llm.breaker_reset_sec,
+        probe_interval_sec: float = SETTINGS.llm.health_probe_interval_sec,
+        probe_timeout_sec: float = SETTINGS.llm.health_probe_timeout_sec,
+        trial_timeout_sec: float = SETTINGS.llm.request_timeout_sec,
+    ) -> None:
+        self._clients = clients
+        self.ttl_sec = ttl_sec
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_sec = reset_sec
+        self.probe_interval_sec = probe_interval_sec
+        self.probe_timeout_sec = probe_timeout_sec
+        self.trial_timeout_sec = trial_timeout_sec
+        self._entries = {name: ProviderHealth(name=name) for name in clients}
+        self._probe_locks: dict[str, asyncio.Lock] = {}
+        self._task: asyncio.Task | None = None
+
+    async def is_available(self, name: str) -> bool:
+        entry = self._entries[name]
+        now = now_ts()
+
+        if entry.state == OPEN:
+            if now - entry.opened_at < self.reset_sec:
+                return False
+            entry.state = HALF_OPEN
+            entry.checked_at = 0.0
+            logger.info("Circuit half-open for provider %s", name)
+
+        self._expire_trial(entry, now)
+        if entry.state == HALF_OPEN and entry.trial_inflight:
+            return False
+
+        if entry.healthy is None or now - entry.checked_at > self.ttl_sec:
+            await self.probe(name)
+            if entry.state == OPEN:
+                return False
+
+        if not entry.healthy:
+            return False
+        if entry.state == HALF_OPEN:
+            entry.trial_inflight = True
+            entry.trial_started_at = now_ts()
+        return True
+
+    async def probe(self, name: str) -> bool:
+        lock = self._probe_locks.setdefault(name, asyncio.Lock())
+        entry = self._entries[name]
+        async with lock:
+            # Another waiter may have refreshed the entry while we were queued.
+            if entry.healthy is not None and now_ts() - entry.checked_at <= self.ttl_sec:
+                return bool(entry.healthy)
+            try:
+                healthy = await self._clients[name].healthcheck(timeout=self.probe_timeout_sec)
+            except Exception as exc:  # noqa: BLE001
+                healthy = False
+                entry.last_error = repr(exc)
+            entry.healthy = healthy
+            entry.checked_at = now_ts()
+            if healthy:
+                if entry.state == CLOSED:
+                    entry.consecutive_failures = 0
+            else:
+                self._register_failure(entry, entry.last_error or "healthcheck failed")
+            return healthy
+
+    def record_success(self, name: str) -> None:
+        entry = self._entries[name]
+        if entry.state != CLOSED:
+            logger.info("Circuit closed for provider %s", name)
+        entry.state = CLOSED
+        entry.healthy = True
+        entry.checked_at = now_ts()
+        entry.consecutive_failures = 0
+        entry.trial_inflight = False
+
+    def release_trial(self, name: str) -> None:
+        self._entries[name].trial_inflight = False
+
+    def record_failure(self, name: str, error: str) -> None:
+        self._register_failure(self._entries[name], error)
+
+    def _expire_trial(self, entry: ProviderHealth, now: float) -> None:
+        # A trial whose caller vanished without reporting must not wedge the breaker.
+        if entry.trial_inflight and now - entry.trial_started_at > self.trial_timeout_sec:
+            logger.warning("Trial request for provider %s never reported back, releasing it", entry.name)
+            entry.trial_inflight = False
+
+    def _register_failure(self, entry: ProviderHealth, error: str) -> None:
+        entry.consecutive_failures += 1
+        entry.last_error = error[:300]
+        entry.trial_inflight = False
+        if entry.state == HALF_OPEN or entry.consecutive_failures >= self.failure_threshold:
+            if entry.state != OPEN:
+                logger.warning("Circuit opened for provider %s: %s", entry.name, entry.last_error)
+            entry.state = OPEN
+            entry.opened_at = now_ts()
+
+    async def _probe_loop(self) -> None:
+        while True:
+            for name, entry in self._entries.items():
+                if entry.state == OPEN and now_ts() - entry.opened_at < self.reset_sec:
+                    continue
+                entry.checked_at = 0.0
+                try:
+                    healthy = await self.probe(name)
+                except Exception as exc:  # noqa: BLE001
+                    logger.warning("health probe failed for %s: %s", name, exc)
+                    continue
+                if healthy and entry.state == OPEN:
+                    entry.state = HALF_OPEN
+                self._expire_trial(entry, now_ts())
+            await asyncio.sleep(self.probe_interval_sec)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._probe_loop())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        now = now_ts()
+        rows: dict[str, dict[str, Any]] = {}
+        for name, entry in self._entries.items():
+            row = asdict(entry)
+            row.pop("name")
+            row["checked_age_sec"] = round(now - entry.checked_at, 2) if entry.checked_at else None
+            rows[name] = row
+        return rows
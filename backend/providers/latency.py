@@ -0,0 +1,48 @@
+﻿from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import Any
+
+
+class LatencyTracker:
+    """Rolling window of observed latencies (seconds) per key, with percentiles."""
+
+    def __init__(self, window: int = 200, min_samples: int = 10) -> None:
+        self.window = max(1, window)
+        self.min_samples = max(1, min_samples)
+        self._samples: dict[str, deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key: str, seconds: float) -> None:
+        with self._lock:
+            bucket = self._samples.setdefault(key, deque(maxlen=self.window))
+            bucket.append(seconds)
+
+    def percentile(self, key: str, q: float) -> float | None:
+        """Nearest-rank percentile, or None until `min_samples` observations exist."""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return self._rank(samples, q)
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            items = {key: sorted(bucket) for key, bucket in self._samples.items()}
+        return {
+            key: {
+                "count": len(samples),
+                "p50": round(self._rank(samples, 0.50), 3),
+                "p95": round(self._rank(samples, 0.95), 3),
+                "p99": round(self._rank(samples, 0.99), 3),
+                "max": round(samples[-1], 3),
+            }
+            for key, samples in items.items()
+            if samples
+        }
+
+    @staticmethod
+    def _rank(samples: list[float], q: float) -> float:
+        index = min(len(samples) - 1, max(0, int(round(q * len(samples))) - 1))
+        return samples[index]
@@ -0,0 +1,82 @@
+﻿from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+
+class GenerationQueueFull(RuntimeError):
+    """Raised when a provider queue already holds `max_queue` waiters."""
+
+
+class GenerationQueueTimeout(RuntimeError):
+    """Raised when a request waited longer than `queue_timeout_sec` for a slot."""
+
+
+class ProviderLimiter:
+    """Bounded concurrency + bounded wait queue in front of one provider."""
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, queue_timeout_sec: float) -> None:
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout_sec = queue_timeout_sec
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._waits: deque[float] = deque(maxlen=200)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        # Occupancy is counted before the first await, so a burst arriving in one tick
+        # sees every caller admitted ahead of it, not just those already holding a slot.
+        if self.active + self.waiting >= self.concurrency + self.max_queue:
+            self.rejected += 1
+            raise GenerationQueueFull(f"{self.name} queue full ({self.waiting} waiting)")
+
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            if self._semaphore.locked():
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout_sec)
+            else:
+                await self._semaphore.acquire()
+        except asyncio.TimeoutError as exc:
+            self.timeouts += 1
+            raise GenerationQueueTimeout(
+                f"{self.name} queue wait exceeded {self.queue_timeout_sec:.0f}s"
+            ) from exc
+        finally:
+            self.waiting -= 1
+
+        self._waits.append(time.perf_counter() - started)
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def stats(self) -> dict[str, Any]:
+        waits = sorted(self._waits)
+        avg = sum(waits) / len(waits) if waits else 0.0
+        p95 = waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0
+        return {
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "wait_avg_sec": round(avg, 4),
+            "wait_p95_sec": round(p95, 4),
+            "wait_max_sec": round(waits[-1], 4) if waits else 0.0,
+        }
@@ -1,8 +1,11 @@
 ﻿from __future__ import annotations
 
+import json
+from collections.abc import AsyncIterator
 from dataclasses import dataclass
 
 from ..core.config import SETTINGS
+from .pool import llm_http_pool, request_timeout
 
 
 @dataclass
@@ -13,15 +16,10 @@ class OllamaClient:
 
     async def healthcheck(self, timeout: float = 3.0) -> bool:
         try:
-            import httpx
-        except Exception:  # noqa: BLE001
-            return False
-
-        try:
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                response = await client.get(f"{self.base_url}/api/tags")
-                response.raise_for_status()
-                payload = response.json()
+            client = llm_http_pool.client()
+            response = await client.get(f"{self.base_url}/api/tags", timeout=timeout)
+            response.raise_for_status()
+            payload = response.json()
         except Exception:  # noqa: BLE001
             return False
 
@@ -41,26 +39,49 @@ class OllamaClient:
                 return True
         return False
 
-    async def generate(self, prompt: str, timeout: float) -> str:
-        try:
-            import httpx
-        except Exception as exc:  # noqa: BLE001
-            raise RuntimeError("httpx package missing") from exc
-
-        payload = {
+    def _payload(self, prompt: str, stream: bool, max_tokens: int | None = None) -> dict:
+        return {
             "model": self.model,
             "prompt": prompt,
-            "stream": False,
+            "stream": stream,
             "options": {
                 "temperature": self.temperature,
                 # Limit generation to keep latency bounded.
-                "num_predict": 700,
+                "num_predict": max_tokens or SETTINGS.llm.max_output_tokens,
             },
         }
 
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(f"{self.base_url}/api/generate", json=payload)
+    async def generate(self, prompt: str, timeout: float, max_tokens: int | None = None) -> str:
+        client = llm_http_pool.client()
+        response = await client.post(
+            f"{self.base_url}/api/generate",
+            json=self._payload(prompt, stream=False, max_tokens=max_tokens),
+            timeout=request_timeout(timeout),
+        )
+        if response.status_code >= 400:
+            raise RuntimeError(f"Ollama error {response.status_code}: {response.text[:400]}")
+        data = response.json()
+        return str(data.get("response", "")).strip()
+
+    async def stream(self, prompt: str, timeout: float) -> AsyncIterator[str]:
+        client = llm_http_pool.client()
+        async with client.stream(
+            "POST",
+            f"{self.base_url}/api/generate",
+            json=self._payload(prompt, stream=True),
+            timeout=request_timeout(timeout),
+        ) as response:
             if response.status_code >= 400:
-                raise RuntimeError(f"Ollama error {response.status_code}: {response.text[:400]}")
-            data = response.json()
-            return str(data.get("response", "")).strip()
+                body = (await response.aread()).decode("utf-8", "replace")
+                raise RuntimeError(f"Ollama error {response.status_code}: {body[:400]}")
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    raise RuntimeError(f"Ollama error: {data['error']}")
+                token = str(data.get("response", ""))
+                if token:
+                    yield token
+                if data.get("done"):
+                    break
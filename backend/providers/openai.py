@@ -1,8 +1,11 @@
 ﻿from __future__ import annotations
 
-from dataclasses import dataclass
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from typing import Any
 
 from ..core.config import SETTINGS
+from .pool import llm_http_pool, request_timeout
 
 
 @dataclass
@@ -10,25 +13,61 @@ class OpenAIClient:
     api_key: str = SETTINGS.openai.api_key
     model: str = SETTINGS.openai.model
     temperature: float = SETTINGS.openai.temperature
+    _sdk: Any = field(default=None, init=False, repr=False)
+    _sdk_http: Any = field(default=None, init=False, repr=False)
 
     async def healthcheck(self, timeout: float = 3.0) -> bool:
         return bool(self.api_key)
 
-    async def generate(self, prompt: str, timeout: float) -> str:
-        if not self.api_key:
-            raise RuntimeError("OPENAI_API_KEY missing")
+    def _client(self) -> Any:
         try:
             from openai import AsyncOpenAI
         except Exception as exc:  # noqa: BLE001
             raise RuntimeError("openai package missing") from exc
 
-        client = AsyncOpenAI(api_key=self.api_key, timeout=timeout)
+        http_client = llm_http_pool.client()
+        # Rebuild only when the pooled transport changed (new event loop or pool closed).
+        if self._sdk is None or self._sdk_http is not http_client:
+            self._sdk = AsyncOpenAI(api_key=self.api_key, http_client=http_client)
+            self._sdk_http = http_client
+        return self._sdk
+
+    async def generate(self, prompt: str, timeout: float, max_tokens: int | None = None) -> str:
+        if not self.api_key:
+            raise RuntimeError("OPENAI_API_KEY missing")
+
+        client = self._client()
+        options: dict[str, Any] = {"max_tokens": max_tokens} if max_tokens else {}
         completion = await client.chat.completions.create(
             model=self.model,
-            messages=[
-                {"role": "system", "content": "You generate concise, high-quality social posts."},
-                {"role": "user", "content": prompt},
-            ],
+            messages=self._messages(prompt),
             temperature=self.temperature,
+            timeout=request_timeout(timeout),
+            **options,
         )
         return (completion.choices[0].message.content or "").strip()
+
+    async def stream(self, prompt: str, timeout: float) -> AsyncIterator[str]:
+        if not self.api_key:
+            raise RuntimeError("OPENAI_API_KEY missing")
+
+        client = self._client()
+        chunks = await client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(prompt),
+            temperature=self.temperature,
+            timeout=request_timeout(timeout),
+            stream=True,
+        )
+        async for chunk in chunks:
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                yield token
+
+    def _messages(self, prompt: str) -> list[dict[str, str]]:
+        return [
+            {"role": "system", "content": "You generate concise, high-quality social posts."},
+            {"role": "user", "content": prompt},
+        ]
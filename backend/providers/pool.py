@@ -0,0 +1,21 @@
+﻿from __future__ import annotations
+
+from typing import Any
+
+from ..core.config import SETTINGS
+from ..core.http import HTTPPool
+
+llm_http_pool = HTTPPool(
+    name="llm",
+    max_connections=SETTINGS.llm.pool_max_connections,
+    max_keepalive_connections=SETTINGS.llm.pool_max_keepalive,
+    keepalive_expiry=SETTINGS.llm.pool_keepalive_expiry_sec,
+    http2=SETTINGS.llm.http2,
+)
+
+
+def request_timeout(read_sec: float) -> Any:
+    """Split timeout: short connect phase, `read_sec` for waiting on the model."""
+    import httpx
+
+    return httpx.Timeout(read_sec, connect=min(SETTINGS.llm.connect_timeout_sec, read_sec))
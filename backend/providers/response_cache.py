@@ -0,0 +1,250 @@
+﻿from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+from ..core.config import SETTINGS
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class LLMResponseCache:
+    """Two-tier (memory LRU + JSON files on disk) cache of raw LLM completions.
+
+    Keys are content addressed: provider, model, temperature and a hash of the
+    full prompt, so any change in the prompt (including the memory "avoid"
+    block) produces a new key. The async entry points used by the router keep
+    the disk tier (index scan, file reads and writes) off the event loop.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = SETTINGS.cache.llm_enabled,
+        ttl_seconds: int = SETTINGS.cache.llm_ttl_seconds,
+        memory_entries: int = SETTINGS.cache.llm_memory_entries,
+        disk_entries: int = SETTINGS.cache.llm_disk_entries,
+        disk_path: str = SETTINGS.cache.llm_disk_path,
+    ) -> None:
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.memory_entries = max(1, memory_entries)
+        self.disk_entries = max(0, disk_entries)
+        self.disk_path = Path(disk_path)
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._disk_index: OrderedDict[str, float] | None = None
+        # The memory tier and the counters are touched inline on the event loop; the disk
+        # index has its own lock and no file I/O ever runs while either one is held.
+        self._memory_lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(provider: str, model: str, temperature: float, prompt: str) -> str:
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        raw = f"{provider}\x1f{model}\x1f{temperature:.3f}\x1f{prompt_hash}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        found = self.get_first([key])
+        return found[1] if found else None
+
+    def get_first(self, keys: list[str]) -> tuple[str, str] | None:
+        """Return `(key, text)` for the first live key; counts a single miss otherwise."""
+        if not self.enabled:
+            return None
+        return self._memory_get_first(keys) or self._disk_get_first(keys)
+
+    async def aget_first(self, keys: list[str]) -> tuple[str, str] | None:
+        """`get_first` for the event loop: memory inline, disk tier in a worker thread."""
+        if not self.enabled:
+            return None
+        found = self._memory_get_first(keys)
+        if found is not None:
+            return found
+        if self.disk_entries <= 0:
+            self._count("misses")
+            return None
+        return await asyncio.to_thread(self._disk_get_first, keys)
+
+    def set(self, key: str, text: str) -> None:
+        if not self.enabled or not text:
+            return
+        expires_at = self._memory_set(key, text)
+        self._disk_set(key, text, expires_at)
+
+    async def aset(self, key: str, text: str) -> None:
+        """`set` for the event loop: the disk write runs in a worker thread."""
+        if not self.enabled or not text:
+            return
+        expires_at = self._memory_set(key, text)
+        if self.disk_entries > 0:
+            await asyncio.to_thread(self._disk_set, key, text, expires_at)
+
+    def load_index(self) -> int:
+        """Scan the disk tier once (blocking); run at startup so lookups never pay for it."""
+        if not self.enabled or self.disk_entries <= 0:
+            return 0
+        index = self._load_disk_index()
+        with self._disk_lock:
+            return len(index)
+
+    def _memory_get_first(self, keys: list[str]) -> tuple[str, str] | None:
+        now = time.time()
+        with self._memory_lock:
+            for key in keys:
+                entry = self._memory.get(key)
+                if entry is not None:
+                    text, expires_at = entry
+                    if expires_at >= now:
+                        self._memory.move_to_end(key)
+                        self._counters["memory_hits"] += 1
+                        return key, text
+                    self._memory.pop(key, None)
+        return None
+
+    def _disk_get_first(self, keys: list[str]) -> tuple[str, str] | None:
+        now = time.time()
+        for key in keys:
+            text = self._disk_get(key, now)
+            if text is not None:
+                self._count("disk_hits")
+                return key, text
+        self._count("misses")
+        return None
+
+    def _memory_set(self, key: str, text: str) -> float:
+        expires_at = time.time() + self.ttl_seconds
+        with self._memory_lock:
+            self._memory_put(key, text, expires_at)
+            self._counters["writes"] += 1
+        return expires_at
+
+    def _disk_set(self, key: str, text: str, expires_at: float) -> None:
+        if self.disk_entries <= 0:
+            return
+        index = self._load_disk_index()
+        target = self._file(key)
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps({"text": text, "expires_at": expires_at}, ensure_ascii=False), encoding="utf-8")
+            tmp.replace(target)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("LLM cache disk write failed: %s", exc)
+            return
+        evicted: list[str] = []
+        with self._disk_lock:
+            index[key] = expires_at
+            index.move_to_end(key)
+            while len(index) > self.disk_entries:
+                evicted.append(index.popitem(last=False)[0])
+        for oldest in evicted:
+            self._unlink(oldest)
+        if evicted:
+            self._count("evictions", len(evicted))
+
+    def clear(self) -> None:
+        with self._memory_lock:
+            self._memory.clear()
+        index = self._load_disk_index()
+        with self._disk_lock:
+            keys = list(index)
+            index.clear()
+        for key in keys:
+            self._unlink(key)
+
+    def stats(self) -> dict[str, Any]:
+        with self._disk_lock:
+            disk_size = len(self._disk_index) if self._disk_index is not None else None
+        with self._memory_lock:
+            lookups = self._counters["memory_hits"] + self._counters["disk_hits"] + self._counters["misses"]
+            hits = lookups - self._counters["misses"]
+            return {
+                "enabled": self.enabled,
+                **self._counters,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_size": len(self._memory),
+                "disk_size": disk_size,
+            }
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._memory_lock:
+            self._counters[counter] += amount
+
+    def _memory_put(self, key: str, text: str, expires_at: float) -> None:
+        self._memory[key] = (text, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _file(self, key: str) -> Path:
+        return self.disk_path / key[:2] / f"{key}.json"
+
+    def _load_disk_index(self) -> OrderedDict[str, float]:
+        """The disk index, scanning the directory without the lock on first use."""
+        with self._disk_lock:
+            if self._disk_index is not None:
+                return self._disk_index
+        rows: list[tuple[float, str, float]] = []
+        if self.disk_path.exists():
+            for path in self.disk_path.glob("*/*.json"):
+                try:
+                    payload = json.loads(path.read_text(encoding="utf-8"))
+                    rows.append((path.stat().st_mtime, path.stem, float(payload["expires_at"])))
+                except Exception:  # noqa: BLE001
+                    path.unlink(missing_ok=True)
+        rows.sort()
+        scanned = OrderedDict((key, expires_at) for _, key, expires_at in rows)
+        with self._disk_lock:
+            # A concurrent scan may have won; keep its index, which writes may already use.
+            if self._disk_index is None:
+                self._disk_index = scanned
+            return self._disk_index
+
+    def _disk_get(self, key: str, now: float) -> str | None:
+        if self.disk_entries <= 0:
+            return None
+        index = self._load_disk_index()
+        with self._disk_lock:
+            expires_at = index.get(key)
+            if expires_at is not None and expires_at < now:
+                index.pop(key, None)
+        if expires_at is None:
+            return None
+        if expires_at < now:
+            self._unlink(key)
+            return None
+        try:
+            text = str(json.loads(self._file(key).read_text(encoding="utf-8"))["text"])
+        except Exception:  # noqa: BLE001
+            self._disk_remove(key)
+            return None
+        with self._disk_lock:
+            if key in index:
+                index.move_to_end(key)
+        with self._memory_lock:
+            self._memory_put(key, text, expires_at)
+        return text
+
+    def _disk_remove(self, key: str) -> None:
+        with self._disk_lock:
+            if self._disk_index is not None:
+                self._disk_index.pop(key, None)
+        self._unlink(key)
+
+    def _unlink(self, key: str) -> None:
+        try:
+            self._file(key).unlink(missing_ok=True)
+        except Exception:  # noqa: BLE001
+            pass
+
+
+response_cache = LLMResponseCache()
@@ -1,13 +1,22 @@
 ﻿from __future__ import annotations
 
+import asyncio
+import time
+from collections.abc import AsyncIterator
 from dataclasses import dataclass
+from typing import Any
 
 from ..core.config import SETTINGS
 from ..core.logger import get_logger
 from ..core.utils import async_retry
 from .groq import GroqClient
+from .health import HealthRegistry
+from .latency import LatencyTracker
+from .limiter import GenerationQueueFull, GenerationQueueTimeout, ProviderLimiter
 from .ollama import OllamaClient
 from .openai import OpenAIClient
+from .pool import llm_http_pool
+from .response_cache import response_cache
 
 logger = get_logger(__name__)
 
@@ -16,6 +25,28 @@ logger = get_logger(__name__)
 class LLMResult:
     text: str
     provider: str
+    cached: bool = False
+
+
+@dataclass
+class LLMChunk:
+    text: str
+    provider: str
+    cached: bool = False
+
+
+@dataclass
+class _Failures:
+    last_error: Exception | None = None
+    queue_error: Exception | None = None
+
+
+def _is_timeout(exc: BaseException | None) -> bool:
+    while exc is not None:
+        if isinstance(exc, TimeoutError) or "Timeout" in type(exc).__name__:
+            return True
+        exc = exc.__cause__
+    return False
 
 
 class LLMRouter:
@@ -25,6 +56,25 @@ class LLMRouter:
             "openai": OpenAIClient(),
             "groq": GroqClient(),
         }
+        self.health = HealthRegistry(self._clients)
+        self._index_task: asyncio.Task | None = None
+        self.limiters = {
+            name: ProviderLimiter(
+                name=name,
+                concurrency=SETTINGS.generation.provider_concurrency.get(
+                    name, SETTINGS.generation.max_parallel_generations
+                ),
+                max_queue=SETTINGS.generation.max_queue_depth,
+                queue_timeout_sec=SETTINGS.generation.queue_timeout_sec,
+            )
+            for name in self._clients
+        }
+        self.latency = LatencyTracker(
+            window=SETTINGS.llm.latency_window,
+            min_samples=SETTINGS.llm.latency_min_samples,
+        )
+        self.hedges_launched = 0
+        self.hedges_won = 0
 
     def _provider_chain(self) -> list[str]:
         preferred = SETTINGS.llm.primary_provider
@@ -34,36 +84,271 @@ class LLMRouter:
             return [preferred] + configured
         return configured
 
-    async def generate(self, prompt: str) -> LLMResult:
-        last_error: Exception | None = None
+    def concurrency(self) -> int:
+        """Generation slots of the preferred provider, for callers sizing a fan-out."""
+        chain = self._provider_chain()
+        return self.limiters[chain[0]].concurrency if chain else 1
 
-        for provider_name in self._provider_chain():
-            client = self._clients[provider_name]
-            try:
-                if not await client.healthcheck(timeout=3.0):
-                    logger.warning("Provider unavailable: %s", provider_name)
-                    continue
+    def _cache_key(self, provider_name: str, prompt: str) -> str:
+        client = self._clients[provider_name]
+        return response_cache.make_key(provider_name, client.model, client.temperature, prompt)
+
+    async def _cached_result(self, prompt: str, chain: list[str]) -> LLMResult | None:
+        if not response_cache.enabled:
+            return None
+        keys = {self._cache_key(provider_name, prompt): provider_name for provider_name in chain}
+        found = await response_cache.aget_first(list(keys))
+        if not found:
+            return None
+        key, text = found
+        return LLMResult(text=text, provider=keys[key], cached=True)
+
+    def _latency_key(self, provider_name: str) -> str:
+        return f"{provider_name}/{self._clients[provider_name].model}"
+
+    def timeout_for(self, provider_name: str) -> float:
+        """Read timeout learned from this provider/model's latency distribution."""
+        ceiling = SETTINGS.llm.request_timeout_sec
+        if not SETTINGS.llm.adaptive_timeouts:
+            return ceiling
+        observed = self.latency.percentile(self._latency_key(provider_name), SETTINGS.llm.timeout_percentile)
+        if observed is None:
+            return ceiling
+        return min(ceiling, max(SETTINGS.llm.timeout_min_sec, observed * SETTINGS.llm.timeout_factor))
+
+    def _hedge_delay(self, provider_name: str) -> float:
+        observed = self.latency.percentile(self._latency_key(provider_name), SETTINGS.llm.hedge_percentile)
+        if observed is None:
+            return SETTINGS.llm.hedge_default_delay_sec
+        return max(SETTINGS.llm.hedge_min_delay_sec, observed)
+
+    async def generate(self, prompt: str, use_cache: bool = True, max_tokens: int | None = None) -> LLMResult:
+        failures = _Failures()
+        chain = self._provider_chain()
+
+        if use_cache:
+            cached = await self._cached_result(prompt, chain)
+            if cached:
+                return cached
+
+        remaining = list(chain)
+        while remaining:
+            provider_name = remaining.pop(0)
+            if not await self.health.is_available(provider_name):
+                logger.warning("Provider unavailable: %s", provider_name)
+                continue
+
+            if SETTINGS.llm.hedge_enabled and remaining:
+                result = await self._attempt_hedged(provider_name, remaining, prompt, failures, max_tokens)
+            else:
+                result = await self._attempt(provider_name, prompt, failures, max_tokens)
+            if result is not None:
+                return result
 
+        if failures.queue_error is not None:
+            raise failures.queue_error
+        raise self._unavailable(failures.last_error)
+
+    async def _attempt(
+        self,
+        provider_name: str,
+        prompt: str,
+        failures: _Failures,
+        max_tokens: int | None = None,
+    ) -> LLMResult | None:
+        client = self._clients[provider_name]
+        timeout = self.timeout_for(provider_name)
+        # Latency stats describe default-size completions; larger ones scale the timeout instead.
+        observe = not max_tokens or max_tokens <= SETTINGS.llm.max_output_tokens
+        if not observe:
+            timeout = min(SETTINGS.llm.request_timeout_sec, timeout * max_tokens / SETTINGS.llm.max_output_tokens)
+        started = time.perf_counter()
+        try:
+            async with self.limiters[provider_name].slot():
+                started = time.perf_counter()
                 text = await async_retry(
                     client.generate,
                     prompt,
-                    timeout=SETTINGS.llm.request_timeout_sec,
+                    timeout=timeout,
+                    max_tokens=max_tokens,
                     retries=SETTINGS.llm.max_retries,
                     delay=0.4,
                 )
+                elapsed = time.perf_counter() - started
+        except (GenerationQueueFull, GenerationQueueTimeout) as exc:
+            # Saturation is not a provider fault: try the next provider, keep the breaker intact.
+            self.health.release_trial(provider_name)
+            failures.queue_error = exc
+            logger.warning("Provider %s saturated: %s", provider_name, exc)
+            return None
+        except asyncio.CancelledError:
+            self.health.release_trial(provider_name)
+            raise
+        except Exception as exc:  # noqa: BLE001
+            if observe and _is_timeout(exc):
+                # Feed the timeout back so a too-tight learned value widens on the next call.
+                self.latency.observe(self._latency_key(provider_name), time.perf_counter() - started)
+            failures.last_error = exc
+            self.health.record_failure(provider_name, repr(exc))
+            logger.warning("Provider %s failed: %r", provider_name, exc)
+            return None
+
+        if not text:
+            self.health.record_failure(provider_name, "empty response")
+            return None
+        if observe:
+            self.latency.observe(self._latency_key(provider_name), elapsed)
+        self.health.record_success(provider_name)
+        await response_cache.aset(self._cache_key(provider_name, prompt), text)
+        return LLMResult(text=text, provider=provider_name)
+
+    async def _attempt_hedged(
+        self,
+        primary: str,
+        remaining: list[str],
+        prompt: str,
+        failures: _Failures,
+        max_tokens: int | None = None,
+    ) -> LLMResult | None:
+        """Race the next available provider if `primary` is slower than its usual percentile.
+
+        Providers consumed as the hedge are removed from `remaining`; the loser is cancelled.
+        """
+        tasks = [asyncio.create_task(self._attempt(primary, prompt, failures, max_tokens))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self._hedge_delay(primary))
+            if done:
+                return tasks[0].result()
+
+            secondary = None
+            while remaining and secondary is None:
+                name = remaining.pop(0)
+                if await self.health.is_available(name):
+                    secondary = name
+            if secondary is None:
+                return await tasks[0]
+
+            self.hedges_launched += 1
+            logger.info("Hedging %s with %s after %.1fs", primary, secondary, self._hedge_delay(primary))
+            tasks.append(asyncio.create_task(self._attempt(secondary, prompt, failures, max_tokens)))
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if result is not None:
+                        if task is tasks[1]:
+                            self.hedges_won += 1
+                        return result
+            return None
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def stream(self, prompt: str, use_cache: bool = True) -> AsyncIterator[LLMChunk]:
+        """Yield tokens as the provider writes them.
+
+        Falls back to the next provider only while nothing has been emitted yet;
+        once a provider produced its first token the stream is committed to it.
+        """
+        last_error: Exception | None = None
+        queue_error: Exception | None = None
+        chain = self._provider_chain()
+
+        if use_cache:
+            cached = await self._cached_result(prompt, chain)
+            if cached:
+                yield LLMChunk(text=cached.text, provider=cached.provider, cached=True)
+                return
+
+        for provider_name in chain:
+            client = self._clients[provider_name]
+            parts: list[str] = []
+            try:
+                if not await self.health.is_available(provider_name):
+                    logger.warning("Provider unavailable: %s", provider_name)
+                    continue
+
+                try:
+                    async with self.limiters[provider_name].slot():
+                        async for token in client.stream(prompt, timeout=self.timeout_for(provider_name)):
+                            parts.append(token)
+                            yield LLMChunk(text=token, provider=provider_name)
+                except (GenerationQueueFull, GenerationQueueTimeout) as exc:
+                    self.health.release_trial(provider_name)
+                    queue_error = exc
+                    logger.warning("Provider %s saturated: %s", provider_name, exc)
+                    continue
+
+                text = "".join(parts).strip()
                 if text:
-                    return LLMResult(text=text, provider=provider_name)
+                    self.health.record_success(provider_name)
+                    await response_cache.aset(self._cache_key(provider_name, prompt), text)
+                    return
+                self.health.record_failure(provider_name, "empty response")
 
             except Exception as exc:  # noqa: BLE001
                 last_error = exc
-                logger.warning("Provider %s failed: %r", provider_name, exc)
+                self.health.record_failure(provider_name, repr(exc))
+                logger.warning("Provider %s stream failed: %r", provider_name, exc)
+                if parts:
+                    raise
+            except BaseException:
+                # Client disconnect / aclose() mid-stream (GeneratorExit, CancelledError):
+                # hand back a half-open trial so the breaker is not left waiting on it.
+                self.health.release_trial(provider_name)
+                raise
+
+        if queue_error is not None:
+            raise queue_error
+        raise self._unavailable(last_error)
 
-        raise RuntimeError(
+    def _unavailable(self, last_error: Exception | None) -> RuntimeError:
+        return RuntimeError(
             "No LLM available. "
             "If you use Ollama: install a model (ex: `ollama pull llama3`) and set OLLAMA_MODEL if needed. "
             "Or set OPENAI_API_KEY / GROQ_API_KEY. "
             f"Last error: {last_error!r}"
         )
 
+    def start(self) -> None:
+        self.health.start()
+        if response_cache.enabled and self._index_task is None:
+            # Scan the disk tier in the background so the first lookup does not block on it.
+            self._index_task = asyncio.create_task(asyncio.to_thread(response_cache.load_index))
+
+    async def aclose(self) -> None:
+        await self.health.stop()
+        task, self._index_task = self._index_task, None
+        if task is not None:
+            await asyncio.gather(task, return_exceptions=True)
+        await llm_http_pool.aclose()
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "chain": self._provider_chain(),
+            "providers": self.health.snapshot(),
+            "queues": {name: limiter.stats() for name, limiter in self.limiters.items()},
+            "http_pool": llm_http_pool.stats(),
+            "response_cache": response_cache.stats(),
+            "latency": self.latency.snapshot(),
+            "timeouts": {
+                name: {
+                    "read_sec": round(self.timeout_for(name), 2),
+                    "connect_sec": round(min(SETTINGS.llm.connect_timeout_sec, self.timeout_for(name)), 2),
+                    "learned": self.latency.percentile(self._latency_key(name), SETTINGS.llm.timeout_percentile)
+                    is not None,
+                }
+                for name in self._clients
+            },
+            "hedging": {
+                "enabled": SETTINGS.llm.hedge_enabled,
+                "launched": self.hedges_launched,
+                "won_by_hedge": self.hedges_won,
+            },
+        }
+
 
 router = LLMRouter()
@@ -1,9 +1,12 @@
 ﻿from __future__ import annotations
 
+from typing import Any
+
 from ..core.config import SETTINGS
 from ..core.logger import get_logger
-from ..core.utils import now_ts, short_hash
+from ..core.utils import now_ts, short_hash, timestamp_from
 from ..models.trend import Trend
+from .pool import fetch_trends, parse_json
 
 logger = get_logger(__name__)
 
@@ -13,12 +16,6 @@ class NewsAPISource:
         if not SETTINGS.sources.newsapi_key:
             return []
 
-        try:
-            import httpx
-        except Exception as exc:  # noqa: BLE001
-            logger.warning("httpx missing: %s", exc)
-            return []
-
         max_items = min(limit or SETTINGS.sources.max_trends_per_source, 50)
         url = "https://newsapi.org/v2/top-headlines"
         params = {
@@ -28,14 +25,20 @@ class NewsAPISource:
         }
 
         try:
-            async with httpx.AsyncClient(timeout=8.0) as client:
-                response = await client.get(url, params=params)
-                response.raise_for_status()
-                payload = response.json()
+            return await fetch_trends(
+                url,
+                parse=parse_json,
+                build=self._build,
+                # Validator key without the API key, which must not end up on disk.
+                key=f"{url}?language=en&pageSize={max_items}",
+                params=params,
+            )
         except Exception as exc:  # noqa: BLE001
             logger.warning("NewsAPI source unavailable: %s", exc)
             return []
 
+    @staticmethod
+    def _build(payload: Any) -> list[Trend]:
         trends: list[Trend] = []
         for article in payload.get("articles", []):
             title = str(article.get("title", "")).strip()
@@ -48,10 +51,10 @@ class NewsAPISource:
                 source="newsapi",
                 source_url=str(article.get("url", "")),
                 language="en",
+                published_at=timestamp_from(article.get("publishedAt")),
                 created_at=now_ts(),
             )
             trends.append(trend)
-
         return trends
 
 
@@ -0,0 +1,109 @@
+﻿from __future__ import annotations
+
+import asyncio
+import json
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, TypeVar
+
+from ..core.config import SETTINGS
+from ..core.http import HTTPPool
+from ..models.trend import Trend
+from .validators import source_validators
+
+T = TypeVar("T")
+
+sources_http_pool = HTTPPool(
+    name="sources",
+    max_connections=SETTINGS.sources.http_max_connections,
+    max_keepalive_connections=SETTINGS.sources.http_max_keepalive,
+    keepalive_expiry=SETTINGS.sources.http_keepalive_expiry_sec,
+    http2=False,
+    headers={"User-Agent": SETTINGS.sources.http_user_agent},
+)
+
+_parse_executor: ThreadPoolExecutor | None = None
+
+
+def feed_timeout() -> Any:
+    import httpx
+
+    timeout = SETTINGS.sources.feed_timeout_sec
+    return httpx.Timeout(timeout, connect=min(SETTINGS.sources.feed_connect_timeout_sec, timeout))
+
+
+async def run_parser(func: Callable[..., T], *args: Any) -> T:
+    """Run a CPU-bound parser off the event loop, on the bounded `parse_workers` pool."""
+    global _parse_executor
+    if _parse_executor is None:
+        _parse_executor = ThreadPoolExecutor(
+            max_workers=max(1, SETTINGS.sources.parse_workers),
+            thread_name_prefix="feed-parse",
+        )
+    return await asyncio.get_running_loop().run_in_executor(_parse_executor, partial(func, *args))
+
+
+def parse_feed(body: bytes, headers: dict[str, str]) -> Any:
+    import feedparser
+
+    # Response headers give feedparser the Content-Type charset, as when it fetched itself.
+    return feedparser.parse(body, response_headers=headers)
+
+
+def parse_json(body: bytes, headers: dict[str, str]) -> Any:
+    return json.loads(body)
+
+
+async def fetch_trends(
+    url: str,
+    parse: Callable[[bytes, dict[str, str]], Any],
+    build: Callable[[Any], list[Trend]],
+    key: str | None = None,
+    params: dict[str, Any] | None = None,
+    headers: dict[str, str] | None = None,
+) -> list[Trend]:
+    """Conditional GET over the shared pool, parse in the worker pool, build trends.
+
+    A 304 or an unchanged body returns the trends cached in `source_validators`
+    without parsing. `key` identifies the feed there (defaults to `url`).
+    """
+    key = key or url
+    client = sources_http_pool.client()
+    response = await client.get(
+        url,
+        params=params,
+        headers={**(headers or {}), **source_validators.headers(key)},
+        timeout=feed_timeout(),
+        # Feeds move (http -> https, new paths); feedparser/urllib used to follow those.
+        follow_redirects=True,
+    )
+    if response.status_code == 304:
+        cached = source_validators.not_modified(key)
+        if cached is not None:
+            return cached
+        response = await client.get(url, params=params, headers=headers, timeout=feed_timeout(), follow_redirects=True)
+    response.raise_for_status()
+
+    body_hash = source_validators.content_hash(response.content)
+    cached = source_validators.unchanged(key, body_hash)
+    if cached is not None:
+        return cached
+
+    trends = build(await run_parser(parse, response.content, dict(response.headers)))
+    source_validators.update(
+        key,
+        trends,
+        etag=response.headers.get("etag", ""),
+        last_modified=response.headers.get("last-modified", ""),
+        body_hash=body_hash,
+    )
+    return trends
+
+
+async def aclose() -> None:
+    global _parse_executor
+    await sources_http_pool.aclose()
+    executor, _parse_executor = _parse_executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
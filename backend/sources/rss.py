@@ -2,11 +2,13 @@
 
 import asyncio
 from dataclasses import dataclass
+from typing import Any
 
 from ..core.config import SETTINGS
 from ..core.logger import get_logger
-from ..core.utils import now_ts, short_hash
+from ..core.utils import now_ts, short_hash, timestamp_from
 from ..models.trend import Trend
+from .pool import fetch_trends, parse_feed
 
 logger = get_logger(__name__)
 
@@ -19,40 +21,45 @@ class RSSSource:
         per_source_limit = limit or SETTINGS.sources.max_trends_per_source
 
         try:
-            import feedparser
+            import feedparser  # noqa: F401
         except Exception as exc:  # noqa: BLE001
             logger.warning("feedparser missing: %s", exc)
             return []
 
-        async def parse_feed(url: str) -> list[Trend]:
+        async def fetch_one(url: str) -> list[Trend]:
             try:
-                parsed = await asyncio.to_thread(feedparser.parse, url)
-                trends: list[Trend] = []
-                for entry in parsed.entries[:per_source_limit]:
-                    title = str(entry.get("title", "")).strip()
-                    if not title:
-                        continue
-                    summary = str(entry.get("summary", "")).strip()[:500]
-                    trend = Trend(
-                        id=f"rss-{short_hash(url + title)}",
-                        title=title,
-                        summary=summary,
-                        source="rss",
-                        source_url=str(entry.get("link", "")),
-                        language="en",
-                        created_at=now_ts(),
-                    )
-                    trends.append(trend)
-                return trends
+                trends = await fetch_trends(url, parse=parse_feed, build=lambda parsed: self._build(url, parsed))
+                return trends[:per_source_limit]
             except Exception as exc:  # noqa: BLE001
                 logger.warning("RSS fetch failed for %s: %s", url, exc)
                 return []
 
-        results = await asyncio.gather(*(parse_feed(url) for url in self.feeds), return_exceptions=False)
+        results = await asyncio.gather(*(fetch_one(url) for url in self.feeds), return_exceptions=False)
         merged: list[Trend] = []
         for bucket in results:
             merged.extend(bucket)
         return merged
 
+    @staticmethod
+    def _build(url: str, parsed: Any) -> list[Trend]:
+        trends: list[Trend] = []
+        for entry in parsed.entries:
+            title = str(entry.get("title", "")).strip()
+            if not title:
+                continue
+            summary = str(entry.get("summary", "")).strip()[:500]
+            trend = Trend(
+                id=f"rss-{short_hash(url + title)}",
+                title=title,
+                summary=summary,
+                source="rss",
+                source_url=str(entry.get("link", "")),
+                language="en",
+                published_at=timestamp_from(entry.get("published_parsed") or entry.get("updated_parsed")),
+                created_at=now_ts(),
+            )
+            trends.append(trend)
+        return trends
+
 
 rss_source = RSSSource(feeds=SETTINGS.sources.rss_feeds)
@@ -0,0 +1,166 @@
+﻿from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+from ..core.config import SETTINGS
+from ..core.logger import get_logger
+from ..core.utils import now_ts
+from ..models.trend import Trend
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class ValidatorEntry:
+    etag: str = ""
+    last_modified: str = ""
+    content_hash: str = ""
+    checked_at: float = 0.0
+    # Trends parsed from the last full response, before enrichment.
+    trends: list[dict[str, Any]] = field(default_factory=list)
+
+
+class ValidatorStore:
+    """Per-feed HTTP validators (ETag, Last-Modified, body hash) plus the trends parsed from that body.
+
+    Sources send conditional requests from it; on a 304, or a 200 whose body hash did
+    not change, they get the previously parsed trends back instead of parsing again.
+    Persisted to JSON so validators survive restarts.
+    """
+
+    def __init__(
+        self,
+        path: str = SETTINGS.sources.validators_path,
+        enabled: bool = SETTINGS.sources.conditional_fetch,
+    ) -> None:
+        self.path = Path(path)
+        self.enabled = enabled
+        self._entries: dict[str, ValidatorEntry] | None = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._counters = {"not_modified": 0, "unchanged": 0, "changed": 0}
+
+    @staticmethod
+    def content_hash(body: bytes) -> str:
+        return hashlib.sha256(body).hexdigest()
+
+    def headers(self, key: str) -> dict[str, str]:
+        """Conditional request headers; empty unless we hold trends to fall back on."""
+        entry = self._get(key)
+        if entry is None:
+            return {}
+        headers: dict[str, str] = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def validators(self, key: str) -> tuple[str, str]:
+        """`(etag, last_modified)` for clients that take them as arguments (feedparser)."""
+        entry = self._get(key)
+        return (entry.etag, entry.last_modified) if entry else ("", "")
+
+    def not_modified(self, key: str) -> list[Trend] | None:
+        """Trends to serve for a 304 answer; None when nothing is cached (caller refetches)."""
+        entry = self._get(key)
+        if entry is None:
+            return None
+        with self._lock:
+            entry.checked_at = now_ts()
+            self._counters["not_modified"] += 1
+        return self._trends(entry)
+
+    def unchanged(self, key: str, body_hash: str) -> list[Trend] | None:
+        """Cached trends when a full response carries the same body as last time."""
+        entry = self._get(key)
+        if entry is None or entry.content_hash != body_hash:
+            return None
+        with self._lock:
+            entry.checked_at = now_ts()
+            self._counters["unchanged"] += 1
+        return self._trends(entry)
+
+    def update(
+        self,
+        key: str,
+        trends: list[Trend],
+        etag: str = "",
+        last_modified: str = "",
+        body_hash: str = "",
+    ) -> None:
+        if not self.enabled:
+            return
+        entry = ValidatorEntry(
+            etag=etag or "",
+            last_modified=last_modified or "",
+            content_hash=body_hash,
+            checked_at=now_ts(),
+            trends=[trend.model_dump() for trend in trends],
+        )
+        with self._lock:
+            self._load()[key] = entry
+            self._dirty = True
+            self._counters["changed"] += 1
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty or self._entries is None:
+                return
+            payload = {key: asdict(entry) for key, entry in self._entries.items()}
+            self._dirty = False
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+            tmp.replace(self.path)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("validator store write failed: %s", exc)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries = {}
+            self._dirty = True
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries) if self._entries is not None else None,
+                **self._counters,
+            }
+
+    def _get(self, key: str) -> ValidatorEntry | None:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._load().get(key)
+        return entry if entry is not None and entry.trends else None
+
+    def _load(self) -> dict[str, ValidatorEntry]:
+        if self._entries is None:
+            self._entries = {}
+            if self.path.exists():
+                try:
+                    raw = json.loads(self.path.read_text(encoding="utf-8"))
+                    self._entries = {key: ValidatorEntry(**value) for key, value in raw.items()}
+                except Exception as exc:  # noqa: BLE001
+                    logger.warning("validator store unreadable, starting empty: %s", exc)
+        return self._entries
+
+    @staticmethod
+    def _trends(entry: ValidatorEntry) -> list[Trend] | None:
+        try:
+            # Fresh objects every time: the analyzer mutates trends while enriching them.
+            return [Trend.model_validate(item) for item in entry.trends]
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("cached trends invalid, refetching: %s", exc)
+            return None
+
+
+source_validators = ValidatorStore()
@@ -1,8 +1,11 @@
 ﻿from __future__ import annotations
 
+from typing import Any
+
 from ..core.logger import get_logger
-from ..core.utils import now_ts, short_hash
+from ..core.utils import now_ts, short_hash, timestamp_from
 from ..models.trend import Trend
+from .pool import fetch_trends, parse_feed
 
 logger = get_logger(__name__)
 
@@ -10,20 +13,23 @@ logger = get_logger(__name__)
 class YouTubeTrendsSource:
     async def fetch(self, limit: int = 15) -> list[Trend]:
         try:
-            import feedparser
+            import feedparser  # noqa: F401
         except Exception as exc:  # noqa: BLE001
             logger.warning("feedparser missing: %s", exc)
             return []
 
         feed = "https://www.youtube.com/feeds/videos.xml?channel_id=UC4R8DWoMoI7CAwX8_LjQHig"
         try:
-            parsed = feedparser.parse(feed)
+            trends = await fetch_trends(feed, parse=parse_feed, build=self._build)
         except Exception as exc:  # noqa: BLE001
             logger.warning("YouTube trends unavailable: %s", exc)
             return []
+        return trends[:limit]
 
+    @staticmethod
+    def _build(parsed: Any) -> list[Trend]:
         trends: list[Trend] = []
-        for entry in parsed.entries[:limit]:
+        for entry in parsed.entries:
             title = str(entry.get("title", "")).strip()
             if not title:
                 continue
@@ -35,11 +41,11 @@ class YouTubeTrendsSource:
                     source="youtube_trends",
                     source_url=str(entry.get("link", "")),
                     language="en",
+                    published_at=timestamp_from(entry.get("published_parsed")),
                     created_at=now_ts(),
                     momentum=0.5,
                 )
             )
-
         return trends
 
 
@@ -1,5 +1,6 @@
 ﻿from __future__ import annotations
 
+import json
 from datetime import datetime
 
 import requests
@@ -24,6 +25,19 @@ THEMES = [
 STYLES = ["insight", "agressive", "ironique", "minimal", "story", "data"]
 
 
+def iter_sse(response: requests.Response):
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
+
+
 st.set_page_config(page_title="Editorial Agent", page_icon="EA", layout="wide")
 
 st.markdown(
@@ -109,10 +123,22 @@ with left:
                 "include_remix": include_remix,
                 "draft_mode": draft_mode,
             }
+            live = st.empty()
+            received: list[dict] = []
             try:
-                response = requests.post(f"{API_URL}/generate/", json=payload, timeout=60)
-                response.raise_for_status()
-                st.session_state.result = response.json()
+                # Streamed: the read timeout applies between events, not to the whole generation.
+                with requests.post(f"{API_URL}/generate/stream", json=payload, stream=True, timeout=(5, 120)) as response:
+                    response.raise_for_status()
+                    for event, data in iter_sse(response):
+                        if event == "candidate":
+                            received.append(data)
+                            lines = [f"- {t['score']} | {t['text']}" for t in sorted(received, key=lambda t: t["score"], reverse=True)]
+                            live.markdown(f"**{len(received)} candidats reçus**\n\n" + "\n".join(lines))
+                        elif event == "done":
+                            st.session_state.result = data
+                        elif event == "error":
+                            raise RuntimeError(data.get("detail", "generation_failed"))
+                live.empty()
             except Exception as exc:  # noqa: BLE001
                 st.error(f"Erreur génération: {exc}")
 
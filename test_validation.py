@@ -85,6 +85,188 @@ def test_logger():
         return False
 
 
+def test_limiter_queue_cap():
+    """A burst never admits more than concurrency + max_queue callers."""
+    import asyncio
+
+    from backend.providers.limiter import GenerationQueueFull, ProviderLimiter
+
+    async def burst() -> tuple[int, int]:
+        limiter = ProviderLimiter("test", concurrency=1, max_queue=16, queue_timeout_sec=5.0)
+        release = asyncio.Event()
+
+        async def call() -> None:
+            async with limiter.slot():
+                await release.wait()
+
+        tasks = [asyncio.create_task(call()) for _ in range(40)]
+        await asyncio.sleep(0.05)
+        release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        rejected = sum(isinstance(result, GenerationQueueFull) for result in results)
+        return rejected, limiter.rejected
+
+    rejected, counted = asyncio.run(burst())
+    assert rejected == 40 - 17
+    assert counted == rejected
+
+
+def test_json_object_stream():
+    """Objects come out as soon as they close, whatever the chunking and string content."""
+    from backend.core.utils import JSONObjectStream
+
+    payload = '{"tweets": [{"text": "a {brace} and \\"quote\\""}, {"text": "b}"}]}'
+    stream = JSONObjectStream()
+    found = []
+    for index in range(0, len(payload), 7):
+        found.extend(stream.feed(payload[index : index + 7]))
+
+    assert [obj.get("text") for obj in found[:2]] == ['a {brace} and "quote"', "b}"]
+    assert found[2] == {"tweets": found[:2]}
+    assert stream.text == payload
+
+
+def test_job_queue_lease_and_ownership(tmp_path):
+    """Expired leases move the job to another worker; the old one can no longer write."""
+    import time
+
+    from backend.core.job_queue import DONE, FAILED, JobQueue
+
+    queue = JobQueue(path=str(tmp_path / "jobs.db"), max_attempts=2, lease_sec=0.05)
+    job = queue.enqueue("pipeline", {"n": 1})
+
+    first = queue.claim("worker-1")
+    assert first is not None and first.attempts == 1
+    assert queue.claim("worker-2") is None
+    time.sleep(0.1)
+
+    second = queue.claim("worker-2")
+    assert second is not None and second.id == job.id and second.attempts == 2
+    assert not queue.heartbeat(first)
+    assert not queue.complete(first, {"stale": True})
+    assert queue.fail(first, "stale") is None
+    assert queue.heartbeat(second)
+
+    # Last attempt: an expired lease fails the job instead of requeueing it.
+    time.sleep(0.1)
+    assert queue.claim("worker-3") is None
+    assert queue.get(job.id).status == FAILED
+    assert not queue.complete(second, {"late": True})
+
+    other = queue.enqueue("pipeline", {"n": 2})
+    claimed = queue.claim("worker-3")
+    assert claimed.id == other.id and queue.complete(claimed, {"ok": True})
+    assert queue.get(other.id).status == DONE
+    queue.close()
+
+
+def test_journal_replay_skips_compacted_entries(tmp_path):
+    """Entries already folded into the snapshot are not replayed twice after a crash."""
+    from backend.agent.memory_store import JournaledJSONMemoryStore
+
+    path = tmp_path / "memory.json"
+    store = JournaledJSONMemoryStore(str(path), fsync="never", compact_every=1000, compact_interval_sec=3600)
+    assert store.load() is None
+
+    db = {"tweets": []}
+    for index in (1, 2):
+        db["tweets"].append({"id": f"t{index}"})
+        store.apply([("tweet", {"id": f"t{index}"})], db)
+    stale = store.journal_path.read_text(encoding="utf-8")
+
+    store.replace(db)
+    db["tweets"].append({"id": "t3"})
+    store.apply([("tweet", {"id": "t3"})], db)
+
+    # No close(): crash after t3, with the pre-compaction entries still in the journal
+    # (snapshot renamed, journal not truncated yet) and a torn last append.
+    journal = store.journal_path.read_text(encoding="utf-8")
+    store.journal_path.write_text(stale + journal + '{"seq": 4, "ops": [', encoding="utf-8")
+
+    reloaded = JournaledJSONMemoryStore(str(path), fsync="never", compact_every=1000, compact_interval_sec=3600)
+    assert [tweet["id"] for tweet in reloaded.load()["tweets"]] == ["t1", "t2", "t3"]
+    assert reloaded.snapshot_seq == 3
+
+
+def test_token_index_matches_exact_jaccard():
+    """Prefix-filtered lookups return exactly the brute-force Jaccard hits."""
+    import random
+
+    from backend.agent.token_index import TokenIndex
+    from backend.core.utils import jaccard_tokens
+
+    rng = random.Random(7)
+    vocabulary = [f"w{index}" for index in range(40)]
+    docs = {doc_id: frozenset(rng.sample(vocabulary, rng.randint(1, 12))) for doc_id in range(300)}
+    index = TokenIndex()
+    for doc_id, tokens in docs.items():
+        index.add(doc_id, tokens)
+    for doc_id in range(0, 300, 7):
+        index.remove(doc_id)
+        del docs[doc_id]
+
+    for _ in range(50):
+        query = frozenset(rng.sample(vocabulary, rng.randint(1, 12)))
+        for threshold in (0.2, 0.5, 0.7, 1.0):
+            expected = {
+                doc_id for doc_id, tokens in docs.items() if jaccard_tokens(query, tokens) >= threshold
+            }
+            hits = index.query(query, threshold)
+            assert {doc_id for doc_id, _ in hits} == expected
+            assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+
+
+def test_lsh_clusters_near_duplicates():
+    """Near-duplicate titles (or summaries) end up together; unrelated documents do not."""
+    from backend.agent.lsh import LSHClusterer, shingles
+
+    def doc(title: str, summary: str = "") -> list[frozenset[str]]:
+        return [shingles(title.split(), 2), shingles(summary.split(), 2)]
+
+    base = "la banque centrale europeenne releve ses taux directeurs pour la troisieme fois cette annee"
+    docs = [
+        doc(base),
+        doc("nouvelle mission spatiale vers la lune annoncee par la nasa pour 2027"),
+        doc(base + " selon reuters"),
+        doc("un autre titre", "le championnat reprend ce week end avec trois matchs en retard a jouer"),
+        doc("titre sans rapport", "le championnat reprend ce week end avec trois matchs en retard a jouer"),
+        doc("recette de la tarte aux pommes facile et rapide"),
+    ]
+    clusterer = LSHClusterer(bands=16, rows=4)
+    clusters = clusterer.cluster(docs, thresholds=[0.7, 0.8])
+
+    assert clusters == [[0, 2], [1], [3, 4], [5]]
+    assert clusterer.verified_pairs == 2
+
+
+def test_validator_store_not_modified_and_hash_hit(tmp_path):
+    """304s and identical bodies serve the cached trends; a new body is parsed again."""
+    from backend.models.trend import Trend
+    from backend.sources.validators import ValidatorStore
+
+    path = tmp_path / "validators.json"
+    store = ValidatorStore(path=str(path), enabled=True)
+    feed = "https://example.com/feed.xml"
+    assert store.headers(feed) == {}
+    assert store.not_modified(feed) is None
+
+    body_hash = store.content_hash(b"<rss>v1</rss>")
+    trend = Trend(id="t1", title="Premier titre", source="rss", created_at=1.0)
+    store.update(feed, [trend], etag='"v1"', last_modified="Mon, 01 Jan 2026 00:00:00 GMT", body_hash=body_hash)
+    assert store.headers(feed) == {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2026 00:00:00 GMT"}
+
+    cached = store.not_modified(feed)
+    assert [item.id for item in cached] == ["t1"]
+    cached[0].title = "modifie par l'analyse"
+    assert store.unchanged(feed, body_hash)[0].title == "Premier titre"
+    assert store.unchanged(feed, store.content_hash(b"<rss>v2</rss>")) is None
+
+    store.save()
+    reloaded = ValidatorStore(path=str(path), enabled=True)
+    assert [item.id for item in reloaded.unchanged(feed, body_hash)] == ["t1"]
+    assert store.stats()["not_modified"] == 1 and store.stats()["unchanged"] == 1
+
+
 def main():
     """Run all tests."""
     print("=" * 60)